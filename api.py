@@ -1,11 +1,18 @@
-from flask import Blueprint, request, jsonify, session
-from database_sqlite import DatabaseSQLite
+from flask import Blueprint, request, jsonify, session, current_app
+from database_sqlite import DatabaseSQLite, LoteInvalidoError, BuscaIndisponivelError
 from auth import AuthManager, login_required, admin_required
 from relatorios import GeradorRelatorios
 from backup_manager import BackupManager
 from dashboard import DashboardGenerator
-import sqlite3
-from datetime import datetime
+from auditoria import GravadorLogs
+from cache import estatisticas_caches, obter_cache, CacheVersionado
+from graficos import FORMATOS, GraficosIndisponiveisError
+from datas import formatar_datas, formatar_epoch
+from paginacao import PaginacaoInvalidaError
+from config import Config
+import os
+import hashlib
+from datetime import datetime, timedelta
 
 api_bp = Blueprint('api', __name__)
 db = DatabaseSQLite()
@@ -13,6 +20,11 @@ auth = AuthManager()
 relatorios = GeradorRelatorios()
 backup = BackupManager()
 dashboard = DashboardGenerator()
+gravador_logs = GravadorLogs(db.pool)
+cache_dados_dashboard = obter_cache(
+    'dashboard_dados', db.db_path,
+    lambda: CacheVersionado(Config.DASHBOARD_CACHE_TTL_SEGUNDOS)
+)
 
 # ============== AUTENTICAÇÃO ==============
 @api_bp.route('/auth/login', methods=['POST'])
@@ -68,18 +80,68 @@ def register():
     return jsonify({'success': False, 'error': 'Username já existe'}), 400
 
 # ============== VEÍCULOS ==============
+@api_bp.errorhandler(PaginacaoInvalidaError)
+def paginacao_invalida(erro):
+    """Cursor, ordem ou ordenação inválidos"""
+    return jsonify({'success': False, 'error': str(erro)}), 400
+
+def _limite_pagina(padrao: int = None):
+    """Lê o parâmetro limit respeitando o máximo por página"""
+    limit = request.args.get('limit', padrao, type=int)
+    if limit is None:
+        return None
+    return max(1, min(limit, Config.PAGINA_MAX_ITENS))
+
+def _resposta_paginada(itens: list, next_cursor: str):
+    """Lista simples em todas as páginas; o cursor da próxima vai no header X-Next-Cursor"""
+    resposta = jsonify(itens)
+    if next_cursor:
+        resposta.headers['X-Next-Cursor'] = next_cursor
+    return resposta
+
 @api_bp.route('/veiculos', methods=['GET'])
 @login_required
 def listar_veiculos():
-    """Lista todos os veículos"""
-    veiculos = db.listar_veiculos()
+    """Lista os veículos (paginados por cursor quando limit/cursor são informados)"""
+    limit = _limite_pagina()
+    cursor = request.args.get('cursor')
+    ordenar = request.args.get('ordenar', 'placa')
+    ordem = request.args.get('ordem', 'asc')
+    
+    if limit is None and cursor is None:
+        veiculos = db.listar_veiculos(ordenar=ordenar, ordem=ordem)
+        next_cursor = None
+    else:
+        veiculos, next_cursor = db.pagina_veiculos(limit or Config.PAGINA_MAX_ITENS,
+                                                   cursor, ordenar, ordem)
     
     # Adicionar status para cada veículo
+    status = db.status_para_veiculos(veiculos)
+    
+    resposta = []
     for veiculo in veiculos:
-        status = db.verificar_status(veiculo['placa'])
-        veiculo['status'] = status
+        veiculo_formatado = formatar_datas(veiculo)
+        veiculo_formatado['status'] = formatar_datas(status[veiculo['placa']])
+        resposta.append(veiculo_formatado)
     
-    return jsonify(veiculos)
+    return _resposta_paginada(resposta, next_cursor)
+
+@api_bp.route('/veiculos/status', methods=['POST'])
+@login_required
+def status_veiculos():
+    """Retorna o status de uma lista de placas em uma única consulta"""
+    data = request.json or {}
+    placas = data.get('placas')
+    
+    if not isinstance(placas, list) or not all(isinstance(p, str) for p in placas):
+        return jsonify({'success': False, 'error': 'Informe a lista de placas'}), 400
+    if len(placas) > Config.LOTE_MAX_REGISTROS:
+        return jsonify({'success': False,
+                        'error': f'Máximo de {Config.LOTE_MAX_REGISTROS} placas por consulta'}), 400
+    
+    status = db.status_das_placas(placas)
+    
+    return jsonify({placa: formatar_datas(info) for placa, info in status.items()})
 
 @api_bp.route('/veiculos/<placa>', methods=['GET'])
 @login_required
@@ -92,11 +154,17 @@ def get_veiculo(placa):
     
     status = db.verificar_status(placa)
     historico = db.buscar_historico(placa, limit=10)
+    agregados = db.buscar_agregados(placa)
+    
+    if agregados:
+        agregados['primeira_manutencao'] = formatar_epoch(agregados['primeira_manutencao'])
+        agregados['ultima_manutencao'] = formatar_epoch(agregados['ultima_manutencao'])
     
     return jsonify({
-        'veiculo': veiculo,
-        'status': status,
-        'historico': historico
+        'veiculo': formatar_datas(veiculo),
+        'status': formatar_datas(status),
+        'historico': [formatar_datas(reg) for reg in historico],
+        'agregados': agregados
     })
 
 @api_bp.route('/veiculos', methods=['POST'])
@@ -114,6 +182,7 @@ def criar_veiculo():
     )
     
     if success:
+        dashboard.dados_alterados()
         registrar_log(
             usuario=session.get('username'),
             acao='CRIAR_VEICULO',
@@ -135,6 +204,7 @@ def registrar_manutencao():
         tecnico=session.get('username', 'Sistema'),
         observacoes=data.get('observacoes', '')
     )
+    dashboard.dados_alterados()
     
     # Registrar log
     registrar_log(
@@ -145,18 +215,68 @@ def registrar_manutencao():
     
     return jsonify({
         'success': True,
-        'registro': registro
+        'registro': formatar_datas(registro)
+    })
+
+@api_bp.route('/manutencoes/lote', methods=['POST'])
+@login_required
+def registrar_manutencoes_lote():
+    """Registra um lote de manutenções em uma única transação"""
+    data = request.json
+    registros = data.get('registros') if isinstance(data, dict) else data
+    
+    try:
+        resultado = db.registrar_manutencoes_lote(
+            registros,
+            tecnico=session.get('username', 'Sistema')
+        )
+    except LoteInvalidoError as e:
+        return jsonify({'success': False, 'error': str(e), 'erros': e.erros}), 400
+    dashboard.dados_alterados()
+    
+    registrar_log(
+        usuario=session.get('username'),
+        acao='REGISTRAR_MANUTENCAO_LOTE',
+        detalhes=f"{resultado['inseridos']} registros - {len(resultado['placas'])} placas"
+    )
+    
+    return jsonify({
+        'success': True,
+        **resultado
     })
 
 @api_bp.route('/manutencoes', methods=['GET'])
 @login_required
 def listar_manutencoes():
-    """Lista manutenções"""
+    """Lista manutenções, paginadas por cursor (data_manutencao, id)"""
     placa = request.args.get('placa')
-    limit = request.args.get('limit', 100, type=int)
+    limit = _limite_pagina(100)
     
-    historico = db.buscar_historico(placa, limit)
-    return jsonify(historico)
+    historico, next_cursor = db.pagina_historico(
+        placa, limit,
+        cursor=request.args.get('cursor'),
+        ordem=request.args.get('ordem', 'desc')
+    )
+    return _resposta_paginada([formatar_datas(reg) for reg in historico], next_cursor)
+
+# ============== BUSCA ==============
+@api_bp.route('/busca', methods=['GET'])
+@login_required
+def buscar():
+    """Busca textual em observações de manutenções e em veículos, por relevância"""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'success': False, 'error': 'Informe o parâmetro q'}), 400
+    limit = _limite_pagina(20)
+    
+    try:
+        resultados, next_cursor = db.buscar_texto(q, limit, cursor=request.args.get('cursor'))
+    except BuscaIndisponivelError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    
+    for item in resultados:
+        item['data'] = formatar_epoch(item['data'])
+    return _resposta_paginada(resultados, next_cursor)
 
 # ============== RELATÓRIOS ==============
 @api_bp.route('/relatorios/completo', methods=['GET'])
@@ -193,17 +313,78 @@ def relatorio_tipos():
 @api_bp.route('/dashboard/dados', methods=['GET'])
 @login_required
 def dashboard_dados():
-    """Retorna dados para o dashboard"""
-    dados = dashboard.gerar_dados_dashboard()
-    return jsonify(dados)
+    """Retorna dados para o dashboard (em cache pela versão dos dados, com ETag)"""
+    return _resposta_em_cache(cache_dados_dashboard, dashboard.gerar_dados_dashboard)
+
+def _resposta_em_cache(cache: CacheVersionado, gerar):
+    """JSON guardado pela versão dos dados; 304 sem corpo se o ETag do cliente ainda vale"""
+    def calcular():
+        corpo = jsonify(gerar()).get_data()
+        return corpo, hashlib.sha256(corpo).hexdigest()[:32]
+    
+    corpo, etag = cache.obter(db.versao_dados(), calcular)
+    return _resposta_condicional(corpo, 'application/json', etag)
+
+def _resposta_condicional(corpo: bytes, mimetype: str, etag: str, max_age: int = None):
+    """Resposta com ETag forte; 304 sem corpo se o If-None-Match do cliente ainda vale.
+    
+    Sem max_age o navegador guarda a resposta, mas revalida a cada consulta.
+    """
+    resposta = current_app.response_class(corpo, mimetype=mimetype)
+    resposta.set_etag(etag)
+    resposta.cache_control.private = True
+    if max_age is None:
+        resposta.cache_control.no_cache = True
+    else:
+        resposta.cache_control.max_age = max_age
+    return resposta.make_conditional(request)
+
+@api_bp.route('/dashboard/ranking', methods=['GET'])
+@login_required
+def dashboard_ranking():
+    """Ranking de veículos por manutenção.
+    
+    limit (até RANKING_LIMITE_MAX), dias (janela, ex.: 30 ou 90) e
+    por_tipo=1 (quantidade de cada tipo por veículo).
+    """
+    limite = max(1, min(request.args.get('limit', 10, type=int), Config.RANKING_LIMITE_MAX))
+    dias = request.args.get('dias', type=int)
+    if dias is not None and not 0 < dias <= Config.RANKING_JANELA_MAX_DIAS:
+        return jsonify({'success': False, 'error': 'Parâmetro dias inválido'}), 400
+    por_tipo = request.args.get('por_tipo', '0').lower() in ('1', 'true', 'sim')
+    
+    return jsonify(dashboard.ranking_veiculos(limite, dias, por_tipo))
 
 @api_bp.route('/dashboard/graficos', methods=['GET'])
 @login_required
 def dashboard_graficos():
     """Gera gráficos para o dashboard"""
-    graficos = dashboard.gerar_graficos_base64()
+    try:
+        graficos = dashboard.gerar_graficos_base64()
+    except GraficosIndisponiveisError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
     return jsonify(graficos)
 
+@api_bp.route('/dashboard/graficos/<nome>.<formato>', methods=['GET'])
+@login_required
+def dashboard_grafico(nome, formato):
+    """Um gráfico (status, tipos, mensal ou dias) como imagem PNG ou SVG"""
+    try:
+        imagem, etag = dashboard.graficos.obter_grafico(nome, formato)
+    except KeyError:
+        return jsonify({'success': False, 'error': 'Gráfico não encontrado'}), 404
+    except GraficosIndisponiveisError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    return _resposta_condicional(imagem, FORMATOS[formato], etag,
+                                 max_age=Config.GRAFICOS_MAX_AGE_SEGUNDOS)
+
+@api_bp.route('/dashboard/graficos/series', methods=['GET'])
+@login_required
+def dashboard_graficos_series():
+    """Séries dos gráficos em JSON, para desenhar no navegador"""
+    corpo = jsonify(dashboard.series_graficos()).get_data()
+    return _resposta_condicional(corpo, 'application/json', hashlib.sha256(corpo).hexdigest()[:32])
+
 # ============== BACKUP ==============
 @api_bp.route('/backup/criar', methods=['POST'])
 @admin_required
@@ -224,6 +405,7 @@ def restaurar_backup():
     data = request.json
     success = backup.restaurar_backup(data['filename'])
     if success:
+        dashboard.dados_alterados()
         registrar_log(
             usuario=session.get('username'),
             acao='RESTAURAR_BACKUP',
@@ -242,23 +424,43 @@ def listar_backups():
 @api_bp.route('/logs', methods=['GET'])
 @admin_required
 def listar_logs():
-    """Lista logs do sistema"""
-    limit = request.args.get('limit', 100, type=int)
-    
-    conn = sqlite3.connect(db.db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM logs 
-        ORDER BY timestamp DESC 
-        LIMIT ?
-    ''', (limit,))
+    """Lista logs do sistema, paginados por cursor (timestamp, id).
     
-    logs = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    inicio/fim (AAAA-MM-DD ou data e hora ISO) consultam também os meses arquivados.
+    """
+    limit = _limite_pagina(100)
+    inicio = _data_parametro('inicio')
+    fim = _data_parametro('fim', fim_do_dia=True)
     
-    return jsonify(logs)
+    # Inclui os logs que ainda estão na fila do gravador
+    gravador_logs.flush(timeout=Config.AUDITORIA_BLOQUEIO_SEGUNDOS)
+    logs, next_cursor = db.pagina_logs(
+        limit,
+        cursor=request.args.get('cursor'),
+        ordem=request.args.get('ordem', 'desc'),
+        inicio=inicio,
+        fim=fim
+    )
+    return _resposta_paginada([formatar_datas(log) for log in logs], next_cursor)
+
+def _data_parametro(nome: str, fim_do_dia: bool = False):
+    """Lê uma data ISO da query string como epoch (data sem hora: dia inteiro)"""
+    valor = request.args.get(nome)
+    if not valor:
+        return None
+    try:
+        data = datetime.fromisoformat(valor)
+    except ValueError:
+        raise PaginacaoInvalidaError(f'Data inválida em {nome}: {valor}')
+    if fim_do_dia and len(valor) == 10:
+        data += timedelta(days=1)
+    return int(data.timestamp())
+
+@api_bp.route('/cache/estatisticas', methods=['GET'])
+@admin_required
+def cache_estatisticas():
+    """Acertos, faltas e tamanho dos caches em memória"""
+    return jsonify(estatisticas_caches(db.db_path))
 
 # ============== UTILITÁRIOS ==============
 @api_bp.route('/tipos-manutencao', methods=['GET'])
@@ -278,14 +480,5 @@ def status():
     })
 
 def registrar_log(usuario: str, acao: str, detalhes: str = None, ip: str = None):
-    """Registra um log no sistema"""
-    conn = sqlite3.connect(db.db_path)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO logs (usuario, acao, detalhes, ip)
-        VALUES (?, ?, ?, ?)
-    ''', (usuario, acao, detalhes, ip))
-    
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    """Registra um log no sistema (gravado em lote, em segundo plano)"""
+    gravador_logs.registrar(usuario, acao, detalhes, ip)
\ No newline at end of file
@@ -0,0 +1,179 @@
+import glob
+import os
+import re
+import sqlite3
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from datas import agora_epoch, SEGUNDOS_DIA
+from pool_conexoes import obter_pool
+
+# Arquivos mensais: logs/logs_AAAA-MM.db
+PADRAO_ARQUIVO = re.compile(r'^logs_(\d{4})-(\d{2})\.db$')
+
+ESQUEMA_ARQUIVO = '''
+    CREATE TABLE IF NOT EXISTS {banco}.logs (
+        id INTEGER PRIMARY KEY,
+        timestamp INTEGER,
+        usuario TEXT,
+        acao TEXT,
+        detalhes,
+        ip TEXT
+    )
+'''
+
+
+def comprimir_texto(texto):
+    """Compacta o texto com zlib quando isso reduz o tamanho"""
+    if texto is None:
+        return None
+    dados = texto.encode('utf-8')
+    compactado = zlib.compress(dados, 9)
+    return compactado if len(compactado) < len(dados) else texto
+
+
+def descomprimir_texto(valor):
+    """Inverso de ``comprimir_texto``"""
+    if isinstance(valor, bytes):
+        return zlib.decompress(valor).decode('utf-8')
+    return valor
+
+
+def _inicio_mes(ano: int, mes: int) -> int:
+    """Início do mês (horário local) em segundos desde a época"""
+    return int(datetime(ano, mes, 1).timestamp())
+
+
+def _inicio_mes_seguinte(ano: int, mes: int) -> int:
+    """Início do mês seguinte (horário local) em segundos desde a época"""
+    return _inicio_mes(ano + mes // 12, mes % 12 + 1)
+
+
+class ArquivoLogs:
+    """Retenção dos logs: meses antigos vão para bancos compactados em LOGS_DIR.
+
+    A tabela ``logs`` do banco principal guarda apenas os últimos
+    ``LOGS_RETENCAO_DIAS``. Os demais são movidos para um arquivo SQLite por
+    mês (``logs_AAAA-MM.db``), com ``detalhes`` compactado, e consultados
+    anexando um arquivo de cada vez.
+    """
+
+    def __init__(self, db_path: str = None, logs_dir: str = None,
+                 retencao_dias: int = None):
+        self.pool = obter_pool(db_path)
+        self.logs_dir = logs_dir or Config.LOGS_DIR
+        self.retencao_dias = retencao_dias or Config.LOGS_RETENCAO_DIAS
+
+    def caminho_arquivo(self, mes: str) -> str:
+        """Arquivo do mês no formato AAAA-MM"""
+        return os.path.join(self.logs_dir, f'logs_{mes}.db')
+
+    def listar_arquivos(self) -> List[Tuple[str, int, int]]:
+        """Arquivos existentes como (caminho, início, fim), do mais novo ao mais antigo"""
+        arquivos = []
+        for caminho in glob.glob(os.path.join(self.logs_dir, 'logs_*.db')):
+            encontrado = PADRAO_ARQUIVO.match(os.path.basename(caminho))
+            if encontrado:
+                ano, mes = int(encontrado.group(1)), int(encontrado.group(2))
+                arquivos.append((caminho, _inicio_mes(ano, mes), _inicio_mes_seguinte(ano, mes)))
+        return sorted(arquivos, key=lambda arquivo: arquivo[1], reverse=True)
+
+    def arquivar(self) -> Dict[str, int]:
+        """Move os logs mais antigos que a retenção para os arquivos mensais"""
+        corte = agora_epoch() - self.retencao_dias * SEGUNDOS_DIA
+
+        with self.pool.conexao() as conn:
+            meses = [row[0] for row in conn.execute('''
+                SELECT DISTINCT strftime('%Y-%m', timestamp, 'unixepoch', 'localtime')
+                FROM logs WHERE timestamp < ?
+            ''', (corte,))]
+        if not meses:
+            return {}
+
+        os.makedirs(self.logs_dir, exist_ok=True)
+        movidos = {}
+        for mes in sorted(meses):
+            ano, numero = map(int, mes.split('-'))
+            inicio = _inicio_mes(ano, numero)
+            fim = min(_inicio_mes_seguinte(ano, numero), corte)
+            movidos[mes] = self._mover_mes(self.caminho_arquivo(mes), inicio, fim)
+            self._compactar(self.caminho_arquivo(mes))
+
+        total = sum(movidos.values())
+        print(f"🗄️ {total} log(s) arquivados em {len(movidos)} arquivo(s) mensal(is)")
+        return movidos
+
+    def _mover_mes(self, caminho: str, inicio: int, fim: int) -> int:
+        """Copia um intervalo para o arquivo do mês e remove da tabela principal"""
+        with self.pool.conexao() as conn:
+            conn.create_function('comprimir_texto', 1, comprimir_texto, deterministic=True)
+            conn.execute('ATTACH DATABASE ? AS arquivo', (caminho,))
+            try:
+                with self.pool.transacao():
+                    conn.execute(ESQUEMA_ARQUIVO.format(banco='arquivo'))
+                    conn.execute('''
+                        CREATE INDEX IF NOT EXISTS arquivo.idx_logs_timestamp
+                        ON logs (timestamp)
+                    ''')
+                    # OR IGNORE: rodar de novo após uma falha não duplica logs
+                    conn.execute('''
+                        INSERT OR IGNORE INTO arquivo.logs
+                            (id, timestamp, usuario, acao, detalhes, ip)
+                        SELECT id, timestamp, usuario, acao, comprimir_texto(detalhes), ip
+                        FROM main.logs
+                        WHERE timestamp >= ? AND timestamp < ?
+                    ''', (inicio, fim))
+                    cursor = conn.execute('''
+                        DELETE FROM main.logs WHERE timestamp >= ? AND timestamp < ?
+                    ''', (inicio, fim))
+                    return cursor.rowcount
+            finally:
+                conn.execute('DETACH DATABASE arquivo')
+
+    def _compactar(self, caminho: str):
+        """Reescreve o arquivo mensal sem páginas livres"""
+        conn = sqlite3.connect(caminho)
+        try:
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+
+    def consultar(self, condicao: str, parametros: list, ordenacao: str, ordem: str,
+                  limite: int, inicio: Optional[int] = None,
+                  fim: Optional[int] = None) -> List[Dict]:
+        """Busca logs arquivados no intervalo, anexando um arquivo por vez.
+
+        Os arquivos são percorridos na ordem da consulta e a busca para assim
+        que ``limite`` linhas foram encontradas.
+        """
+        arquivos = [
+            arquivo for arquivo in self.listar_arquivos()
+            if (inicio is None or arquivo[2] > inicio) and (fim is None or arquivo[1] < fim)
+        ]
+        if ordem == 'asc':
+            arquivos.reverse()
+
+        linhas = []
+        with self.pool.conexao() as conn:
+            for caminho, _, _ in arquivos:
+                if len(linhas) >= limite:
+                    break
+                conn.execute('ATTACH DATABASE ? AS arquivo', (caminho,))
+                try:
+                    cursor = conn.cursor()
+                    cursor.row_factory = sqlite3.Row
+                    cursor.execute(f'''
+                        SELECT * FROM arquivo.logs
+                        {condicao}
+                        {ordenacao}
+                        LIMIT ?
+                    ''', (*parametros, limite - len(linhas)))
+                    linhas.extend(dict(row) for row in cursor.fetchall())
+                finally:
+                    conn.execute('DETACH DATABASE arquivo')
+
+        for linha in linhas:
+            linha['detalhes'] = descomprimir_texto(linha['detalhes'])
+        return linhas
\ No newline at end of file
@@ -0,0 +1,182 @@
+import atexit
+import threading
+import time
+from queue import Queue, Empty, Full
+from typing import List, Optional, Tuple
+
+from config import Config
+from datas import agora_epoch
+
+POLITICAS_FILA_CHEIA = ('sincrono', 'bloquear', 'descartar')
+
+_PARAR = object()
+
+
+class GravadorLogs:
+    """Grava os logs de auditoria em segundo plano, em lotes.
+
+    ``registrar()`` apenas coloca o log em uma fila limitada. Uma única
+    thread esvazia a fila e insere os logs com ``executemany`` em uma
+    transação quando o lote enche, quando o intervalo vence, em ``flush()``
+    e no encerramento do processo.
+
+    Com a fila cheia, a política define o que acontece com o novo log:
+    ``sincrono`` grava na própria requisição, ``bloquear`` espera por espaço
+    (até ``AUDITORIA_BLOQUEIO_SEGUNDOS``, depois grava na requisição) e
+    ``descartar`` ignora o log, contando o descarte.
+    """
+
+    def __init__(self, pool, capacidade: int = None, lote: int = None,
+                 intervalo: float = None, politica: str = None):
+        self.pool = pool
+        self.lote = lote or Config.AUDITORIA_LOTE_MAX
+        self.intervalo = intervalo or Config.AUDITORIA_INTERVALO_SEGUNDOS
+        self.politica = politica or Config.AUDITORIA_POLITICA_FILA_CHEIA
+        if self.politica not in POLITICAS_FILA_CHEIA:
+            raise ValueError(f'Política de fila cheia inválida: {self.politica}')
+
+        self._fila = Queue(maxsize=capacidade or Config.AUDITORIA_FILA_MAX)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._gravados = 0
+        self._sincronos = 0
+        self._descartados = 0
+        self._erros = 0
+
+    def registrar(self, usuario: str, acao: str, detalhes: str = None,
+                  ip: str = None) -> bool:
+        """Enfileira um log; retorna False se ele foi descartado"""
+        log = (usuario, acao, detalhes, ip, agora_epoch())
+        self._iniciar()
+
+        try:
+            if self.politica == 'bloquear':
+                self._fila.put(log, timeout=Config.AUDITORIA_BLOQUEIO_SEGUNDOS)
+            else:
+                self._fila.put_nowait(log)
+            return True
+        except Full:
+            pass
+
+        if self.politica == 'descartar':
+            with self._lock:
+                self._descartados += 1
+            return False
+
+        self._gravar([log])
+        with self._lock:
+            self._sincronos += 1
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """Espera até que os logs enfileirados até agora estejam gravados"""
+        if self._thread is None or not self._thread.is_alive():
+            self._gravar(self._drenar())
+            return True
+        concluido = threading.Event()
+        try:
+            self._fila.put(concluido, timeout=timeout)
+        except Full:
+            return False
+        return concluido.wait(timeout)
+
+    def parar(self, timeout: float = 5):
+        """Grava o que estiver na fila e encerra a thread"""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._fila.put(_PARAR)
+        thread.join(timeout)
+
+    def estatisticas(self) -> dict:
+        """Contadores do gravador"""
+        with self._lock:
+            return {
+                'pendentes': self._fila.qsize(),
+                'gravados': self._gravados,
+                'gravados_sincronos': self._sincronos,
+                'descartados': self._descartados,
+                'erros': self._erros,
+                'politica': self.politica
+            }
+
+    def _iniciar(self):
+        """Sobe a thread na primeira gravação"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._thread is None:
+                atexit.register(self.parar)
+            self._thread = threading.Thread(target=self._executar, daemon=True,
+                                            name='gravador-logs')
+            self._thread.start()
+
+    def _executar(self):
+        """Laço da thread: junta logs em lotes e grava"""
+        while True:
+            item = self._fila.get()
+            pendentes: List[Tuple] = []
+            avisar: List[threading.Event] = []
+            parar = False
+            limite = time.monotonic() + self.intervalo
+
+            while True:
+                if item is _PARAR:
+                    parar = True
+                    break
+                if isinstance(item, threading.Event):
+                    avisar.append(item)
+                    break
+                pendentes.append(item)
+                restante = limite - time.monotonic()
+                if len(pendentes) >= self.lote or restante <= 0:
+                    break
+                try:
+                    item = self._fila.get(timeout=restante)
+                except Empty:
+                    break
+
+            if parar:
+                pendentes.extend(self._drenar(avisar))
+            self._gravar(pendentes)
+            for evento in avisar:
+                evento.set()
+            if parar:
+                return
+
+    def _drenar(self, avisar: Optional[List[threading.Event]] = None) -> List[Tuple]:
+        """Retira tudo o que está na fila sem esperar"""
+        logs = []
+        while True:
+            try:
+                item = self._fila.get_nowait()
+            except Empty:
+                return logs
+            if isinstance(item, threading.Event):
+                if avisar is not None:
+                    avisar.append(item)
+                else:
+                    item.set()
+            elif item is not _PARAR:
+                logs.append(item)
+
+    def _gravar(self, logs: List[Tuple]):
+        """Insere um lote de logs em uma única transação"""
+        if not logs:
+            return
+        try:
+            with self.pool.transacao() as conn:
+                conn.executemany('''
+                    INSERT INTO logs (usuario, acao, detalhes, ip, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', logs)
+        except Exception as e:
+            with self._lock:
+                self._erros += len(logs)
+            print(f"❌ Erro ao gravar {len(logs)} log(s): {e}")
+            return
+        with self._lock:
+            self._gravados += len(logs)
\ No newline at end of file
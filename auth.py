@@ -4,12 +4,14 @@ from datetime import datetime, timedelta
 import sqlite3
 import jwt
 import os
+from pool_conexoes import obter_pool
 from functools import wraps
 from flask import request, jsonify, session
 
 class AuthManager:
     def __init__(self, db_path='manutencao.db', secret_key=None):
         self.db_path = db_path
+        self.pool = obter_pool(db_path)
         self.secret_key = secret_key or secrets.token_hex(32)
     
     def hash_password(self, password: str) -> str:
@@ -31,31 +33,34 @@ class AuthManager:
     def criar_usuario(self, username: str, password: str, nome: str = None, 
                      email: str = None, nivel_acesso: int = 1) -> bool:
         """Cria um novo usuário"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        password_hash = self.hash_password(password)
         
-        try:
-            password_hash = self.hash_password(password)
-            cursor.execute('''
-                INSERT INTO usuarios (username, password_hash, nome, email, nivel_acesso)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (username, password_hash, nome, email, nivel_acesso))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-        finally:
-            conn.close()
+        with self.pool.conexao() as conn:
+            try:
+                conn.execute('''
+                    INSERT INTO usuarios (username, password_hash, nome, email, nivel_acesso)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (username, password_hash, nome, email, nivel_acesso))
+                conn.commit()
+                return True
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                return False
+    
+    def usuario_existe(self, username: str) -> bool:
+        """Verifica se o usuário existe (sem calcular hash de senha)"""
+        with self.pool.conexao() as conn:
+            return conn.execute('SELECT 1 FROM usuarios WHERE username = ?',
+                                (username,)).fetchone() is not None
     
     def autenticar(self, username: str, password: str):
         """Autentica um usuário"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM usuarios WHERE username = ?', (username,))
-        user = cursor.fetchone()
-        conn.close()
+        with self.pool.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            
+            cursor.execute('SELECT * FROM usuarios WHERE username = ?', (username,))
+            user = cursor.fetchone()
         
         if user and self.verify_password(user['password_hash'], password):
             return dict(user)
@@ -103,7 +108,7 @@ def admin_required(f):
 def criar_admin_padrao(db_path='manutencao.db'):
     """Cria usuário admin padrão se não existir"""
     auth = AuthManager(db_path)
-    if not auth.autenticar('admin', 'admin123'):
+    if not auth.usuario_existe('admin'):
         auth.criar_usuario('admin', 'admin123', 'Administrador', 
                           'admin@sistema.com', nivel_acesso=2)
         print("✅ Usuário admin criado (admin/admin123)")
@@ -7,11 +7,18 @@ import zipfile
 import schedule
 import time
 import threading
+from pool_conexoes import obter_pool, obter_pool_leitura
+from migracoes import aplicar_migracoes, renovar_versoes_dados
+from arquivo_logs import ArquivoLogs
+from cache import obter_cache_status, limpar_caches
+from config import Config
 
 class BackupManager:
     def __init__(self, db_path='manutencao.db', backup_dir='backups'):
         self.db_path = db_path
+        self.pool = obter_pool(db_path)
         self.backup_dir = backup_dir
+        self.arquivo_logs = ArquivoLogs(db_path)
         
         if not os.path.exists(backup_dir):
             os.makedirs(backup_dir)
@@ -25,10 +32,10 @@ class BackupManager:
         # Criar pasta do backup
         os.makedirs(backup_path, exist_ok=True)
         
-        # Backup do banco SQLite
+        # Backup do banco SQLite (API de backup inclui o conteúdo do WAL)
         if os.path.exists(self.db_path):
             db_backup = os.path.join(backup_path, 'manutencao.db')
-            shutil.copy2(self.db_path, db_backup)
+            self._copiar_banco(self.db_path, db_backup)
         
         # Backup dos arquivos JSON (se existirem)
         json_files = ['manutencoes.json', 'historico.json']
@@ -36,6 +43,12 @@ class BackupManager:
             if os.path.exists(json_file):
                 shutil.copy2(json_file, os.path.join(backup_path, json_file))
         
+        # Backup dos logs arquivados (um banco por mês)
+        for caminho, _, _ in self.arquivo_logs.listar_arquivos():
+            logs_backup = os.path.join(backup_path, 'logs')
+            os.makedirs(logs_backup, exist_ok=True)
+            self._copiar_arquivo_logs(caminho, os.path.join(logs_backup, os.path.basename(caminho)))
+        
         # Backup dos relatórios
         if os.path.exists('exports'):
             exports_backup = os.path.join(backup_path, 'exports')
@@ -58,20 +71,44 @@ class BackupManager:
         
         return zip_path
     
+    def _copiar_banco(self, origem: str, destino: str):
+        """Copia um banco SQLite de forma consistente usando a API de backup"""
+        if origem == self.db_path:
+            with self.pool.conexao() as conn_origem:
+                conn_destino = sqlite3.connect(destino)
+                try:
+                    conn_origem.backup(conn_destino)
+                finally:
+                    conn_destino.close()
+        else:
+            conn_origem = sqlite3.connect(origem)
+            try:
+                with self.pool.conexao() as conn_destino:
+                    conn_origem.backup(conn_destino)
+            finally:
+                conn_origem.close()
+    
+    def _copiar_arquivo_logs(self, origem: str, destino: str):
+        """Copia um arquivo mensal de logs pela API de backup"""
+        conn_origem = sqlite3.connect(origem)
+        conn_destino = sqlite3.connect(destino)
+        try:
+            conn_origem.backup(conn_destino)
+        finally:
+            conn_destino.close()
+            conn_origem.close()
+    
     def _registrar_backup(self, arquivo: str):
         """Registra backup no banco de dados"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         tamanho = os.path.getsize(arquivo)
         
-        cursor.execute('''
-            INSERT INTO backups (arquivo, tamanho, status)
-            VALUES (?, ?, ?)
-        ''', (os.path.basename(arquivo), tamanho, 'SUCESSO'))
-        
-        conn.commit()
-        conn.close()
+        with self.pool.conexao() as conn:
+            conn.execute('''
+                INSERT INTO backups (arquivo, tamanho, status)
+                VALUES (?, ?, ?)
+            ''', (os.path.basename(arquivo), tamanho, 'SUCESSO'))
+            
+            conn.commit()
     
     def restaurar_backup(self, backup_filename: str) -> bool:
         """Restaura um backup específico"""
@@ -95,8 +132,17 @@ class BackupManager:
             if os.path.exists(db_backup):
                 # Fazer backup do banco atual antes de restaurar
                 self.criar_backup_completo()
-                # Restaurar
-                shutil.copy2(db_backup, self.db_path)
+                # Restaurar pela API de backup (seguro com WAL e conexões abertas)
+                self._copiar_banco(db_backup, self.db_path)
+                self.pool.fechar_todas()
+                obter_pool_leitura(self.db_path).fechar_todas()
+                # Backups antigos podem estar em uma versão anterior do esquema
+                with self.pool.conexao() as conn:
+                    aplicar_migracoes(conn)
+                # Estados incrementais (inclusive de outros processos) são refeitos
+                with self.pool.transacao() as conn:
+                    renovar_versoes_dados(conn)
+                limpar_caches(self.db_path)
             
             # Restaurar arquivos JSON
             json_files = ['manutencoes.json', 'historico.json']
@@ -105,6 +151,14 @@ class BackupManager:
                 if os.path.exists(json_backup):
                     shutil.copy2(json_backup, json_file)
             
+            # Restaurar logs arquivados
+            logs_backup = os.path.join(temp_dir, 'logs')
+            if os.path.exists(logs_backup):
+                os.makedirs(self.arquivo_logs.logs_dir, exist_ok=True)
+                for arquivo in os.listdir(logs_backup):
+                    self._copiar_arquivo_logs(os.path.join(logs_backup, arquivo),
+                                              os.path.join(self.arquivo_logs.logs_dir, arquivo))
+            
             # Restaurar exports
             exports_backup = os.path.join(temp_dir, 'exports')
             if os.path.exists(exports_backup):
@@ -123,16 +177,17 @@ class BackupManager:
         """Lista todos os backups disponíveis"""
         backups = []
         
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM backups 
-            ORDER BY data_backup DESC
-        ''')
+        with self.pool.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            
+            cursor.execute('''
+                SELECT * FROM backups 
+                ORDER BY data_backup DESC
+            ''')
+            rows = cursor.fetchall()
         
-        for row in cursor.fetchall():
+        for row in rows:
             backup = dict(row)
             backup['tamanho_mb'] = round(backup['tamanho'] / (1024 * 1024), 2)
             backup['data_formatada'] = datetime.strptime(
@@ -140,22 +195,17 @@ class BackupManager:
             ).strftime('%d/%m/%Y %H:%M')
             backups.append(backup)
         
-        conn.close()
-        
         return backups
     
     def limpar_backups_antigos(self, dias=30):
         """Remove backups com mais de X dias"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM backups 
-            WHERE julianday('now') - julianday(data_backup) > ?
-        ''', (dias,))
-        
-        conn.commit()
-        conn.close()
+        with self.pool.conexao() as conn:
+            conn.execute('''
+                DELETE FROM backups 
+                WHERE julianday('now') - julianday(data_backup) > ?
+            ''', (dias,))
+            
+            conn.commit()
         
         # Remover arquivos físicos
         for file in os.listdir(self.backup_dir):
@@ -167,10 +217,19 @@ class BackupManager:
                     os.remove(file_path)
                     print(f"🗑️ Removido backup antigo: {file}")
     
+    def reconstruir_cache_status(self):
+        """Recalcula o cache de status da frota para o novo dia"""
+        cache_status = obter_cache_status(self.db_path)
+        if cache_status:
+            total = cache_status.reconstruir()
+            print(f"🔄 Cache de status reconstruído: {total} veículos")
+    
     def iniciar_backup_automatico(self, intervalo_horas=24):
         """Inicia backup automático em intervalo regular"""
         schedule.every(intervalo_horas).hours.do(self.criar_backup_completo)
         schedule.every().day.at("03:00").do(lambda: self.limpar_backups_antigos(30))
+        schedule.every().day.at(Config.LOGS_ARQUIVAMENTO_HORARIO).do(self.arquivo_logs.arquivar)
+        schedule.every().day.at("00:00").do(self.reconstruir_cache_status)
         
         def run_schedule():
             while True:
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do Sistema de Controle de Manutenção
+
+Uso:
+    python benchmark.py registrar [-n 2000] [--threads 4]
+    python benchmark.py dashboard [-n 50000] [--repeticoes 5]
+    python benchmark.py inicializacao [--repeticoes 5] [--modulo web_app_completo] [--alvo 0.5]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from dashboard import DashboardGenerator
+from database_sqlite import DatabaseSQLite
+from datas import agora_epoch, dias_desde, SEGUNDOS_DIA
+from indice_frota import IndiceFrota
+
+
+def print_step(step):
+    """Imprime o título de um benchmark"""
+    print("\n" + "=" * 60)
+    print(f"⏱️  {step}")
+    print("=" * 60)
+
+
+def executar_em_threads(func, total: int, threads: int) -> dict:
+    """Executa ``func(i)`` ``total`` vezes divididas entre threads"""
+    erros = []
+    lock = threading.Lock()
+
+    def trabalhador(inicio):
+        for i in range(inicio, total, threads):
+            try:
+                func(i)
+            except Exception as e:
+                with lock:
+                    erros.append(e)
+
+    inicio = time.perf_counter()
+    ativas = [threading.Thread(target=trabalhador, args=(t,)) for t in range(threads)]
+    for thread in ativas:
+        thread.start()
+    for thread in ativas:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    return {
+        'segundos': duracao,
+        'por_segundo': total / duracao if duracao else 0,
+        'erros': len(erros)
+    }
+
+
+def imprimir_resultado(nome: str, resultado: dict):
+    """Imprime uma linha de resultado"""
+    print(f"{nome:<28} {resultado['segundos']:>8.3f}s "
+          f"{resultado['por_segundo']:>10.0f}/s  erros: {resultado['erros']}")
+
+
+# ============== REGISTRO DE MANUTENÇÃO ==============
+def registrar_manutencao_legado(db_path: str, placa: str, tipo: str,
+                                tecnico: str = "Sistema", observacoes: str = "") -> dict:
+    """Implementação anterior: uma conexão por chamada e leitura após o commit"""
+    def buscar_veiculo(placa):
+        conn = sqlite3.connect(db_path)
+        row = conn.execute('SELECT * FROM veiculos WHERE placa = ?', (placa.upper(),)).fetchone()
+        conn.close()
+        return row
+
+    def adicionar_veiculo(placa):
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute('INSERT INTO veiculos (placa) VALUES (?)', (placa.upper(),))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            pass
+        finally:
+            conn.close()
+
+    # Mesmas consultas de antes, com as datas em epoch do esquema atual
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        data_atual = agora_epoch()
+
+        if not buscar_veiculo(placa):
+            adicionar_veiculo(placa)
+
+        cursor.execute('''
+            INSERT INTO manutencoes (placa, tipo, tecnico, observacoes, data_manutencao)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (placa.upper(), tipo, tecnico, observacoes, data_atual))
+        cursor.execute('''
+            UPDATE veiculos SET ultima_manutencao = ?, ultimo_tipo = ? WHERE placa = ?
+        ''', (data_atual, tipo, placa.upper()))
+        conn.commit()
+
+        cursor.execute('SELECT * FROM manutencoes WHERE id = last_insert_rowid()')
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+    return {'id': row[0]} if row else {}
+
+
+def bench_registrar(args):
+    """Compara o registro de manutenção atual com a implementação anterior"""
+    print_step(f"registrar_manutencao - {args.n} registros, {args.threads} thread(s)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_legado = DatabaseSQLite(os.path.join(tmp, 'legado.db'))
+        db_atual = DatabaseSQLite(os.path.join(tmp, 'atual.db'))
+        placas = [f'BEN{i:04d}' for i in range(max(args.n // 10, 1))]
+
+        legado = executar_em_threads(
+            lambda i: registrar_manutencao_legado(
+                db_legado.db_path, placas[i % len(placas)], 'LIMPEZA DA LENTE'
+            ),
+            args.n, args.threads
+        )
+        atual = executar_em_threads(
+            lambda i: db_atual.registrar_manutencao(
+                placas[i % len(placas)], 'LIMPEZA DA LENTE'
+            ),
+            args.n, args.threads
+        )
+
+        imprimir_resultado('legado (3 conexões)', legado)
+        imprimir_resultado('atual (1 transação)', atual)
+        if legado['erros'] or atual['erros']:
+            print("\n⚠️ Houve erros: a aceleração não é comparável")
+        elif atual['segundos']:
+            print(f"\n🚀 Aceleração: {legado['segundos'] / atual['segundos']:.1f}x")
+
+
+# ============== DASHBOARD ==============
+def kpis_dashboard_legado(df_veiculos) -> tuple:
+    """Implementação anterior: um laço iterrows por KPI, alerta e gráfico"""
+    agora = agora_epoch()
+
+    # Resumo da frota
+    dias_atraso = []
+    for _, row in df_veiculos[df_veiculos['ultima_manutencao'].notna()].iterrows():
+        dias_atraso.append(dias_desde(row['ultima_manutencao'], agora))
+    verdes = len([d for d in dias_atraso if d <= 6])
+    amarelos = len([d for d in dias_atraso if 6 < d <= 13])
+    vermelhos = len([d for d in dias_atraso if d > 13])
+
+    # Alertas
+    alertas = []
+    for _, row in df_veiculos.iterrows():
+        dias = dias_desde(row['ultima_manutencao'], agora)
+        if dias is not None and dias > 13:
+            alertas.append((row['placa'], dias))
+    alertas = sorted(alertas, key=lambda alerta: alerta[1], reverse=True)[:5]
+
+    # Gráfico de status
+    status = {'Em dia': 0, 'Atenção': 0, 'Crítico': 0}
+    for _, row in df_veiculos.iterrows():
+        dias = dias_desde(row['ultima_manutencao'], agora)
+        if dias is not None:
+            if dias <= 6:
+                status['Em dia'] += 1
+            elif dias <= 13:
+                status['Atenção'] += 1
+            else:
+                status['Crítico'] += 1
+
+    # Histograma
+    histograma = []
+    for _, row in df_veiculos.iterrows():
+        dias = dias_desde(row['ultima_manutencao'], agora)
+        if dias is not None:
+            histograma.append(dias)
+
+    return (verdes, amarelos, vermelhos), alertas, status, histograma
+
+
+def kpis_dashboard_atual(dashboard, indice) -> tuple:
+    """Implementação atual: um único cálculo vetorizado sobre o índice da frota"""
+    frota = dashboard._dias_frota(indice)
+    resumo = dashboard._resumo_frota(frota)
+    return ((resumo['verdes'], resumo['amarelos'], resumo['vermelhos']),
+            dashboard.alertas_dashboard(frota),
+            dashboard._get_status_counts(frota),
+            dashboard._get_dias_sem_manutencao(frota))
+
+
+def medir(func, repeticoes: int) -> float:
+    """Melhor tempo (segundos) entre as repetições"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def bench_dashboard(args):
+    """Compara os KPIs do dashboard (laços iterrows x vetorizado no índice)"""
+    print_step(f"KPIs do dashboard - {args.n} veículos, {args.repeticoes} repetição(ões)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'dashboard.db')
+        db = DatabaseSQLite(db_path)
+        agora = agora_epoch()
+        aleatorio = random.Random(42)
+        with db.pool.transacao() as conn:
+            conn.executemany(
+                'INSERT INTO veiculos (placa, ultima_manutencao) VALUES (?, ?)',
+                [(f'DSH{i:05d}',
+                  None if i % 20 == 0 else agora - aleatorio.randint(0, 60 * SEGUNDOS_DIA))
+                 for i in range(args.n)]
+            )
+
+        dashboard = DashboardGenerator(db_path)
+        with dashboard.pool.conexao() as conn:
+            df_veiculos = pd.read_sql_query(
+                'SELECT placa, ultima_manutencao FROM veiculos ORDER BY id', conn)
+
+        # Índice em memória, o mesmo usado pelo estado do dashboard
+        indice = IndiceFrota(dashboard.db.pool)
+
+        legado = kpis_dashboard_legado(df_veiculos)
+        atual = kpis_dashboard_atual(dashboard, indice)
+        if legado[0] != atual[0] or [(a['placa'], a['dias']) for a in atual[1]] != legado[1]:
+            print("⚠️ Resultados diferentes entre as implementações!")
+
+        tempos = [('legado (4x iterrows)', medir(lambda: kpis_dashboard_legado(df_veiculos),
+                                                 args.repeticoes)),
+                  ('vetorizado (índice)', medir(lambda: kpis_dashboard_atual(dashboard, indice),
+                                                args.repeticoes))]
+
+        for nome, segundos in tempos:
+            print(f"{nome:<28} {segundos * 1000:>10.1f} ms")
+        for nome, segundos in tempos[1:]:
+            if segundos:
+                print(f"🚀 Aceleração {nome}: {tempos[0][1] / segundos:.0f}x")
+
+
+# ============== INICIALIZAÇÃO ==============
+# Imports que não devem acontecer na inicialização do servidor
+MODULOS_PESADOS = ('pandas', 'matplotlib', 'seaborn', 'numpy')
+
+
+def medir_inicializacao(modulo: str, diretorio: str) -> tuple:
+    """Importa ``modulo`` em um processo novo: (segundos do import, módulos pesados carregados)"""
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    codigo = (f"import sys, time; sys.path.insert(0, {raiz!r}); inicio = time.perf_counter(); "
+              f"import {modulo}; print(time.perf_counter() - inicio); "
+              f"print(','.join(m for m in {MODULOS_PESADOS!r} if m in sys.modules))")
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=diretorio, check=True,
+                           capture_output=True, text=True).stdout.splitlines()
+    return float(saida[-2]), saida[-1]
+
+
+def bench_inicializacao(args):
+    """Tempo de import do app em processos novos (spawn/restart de worker do gunicorn)"""
+    print_step(f"Inicialização - import de {args.modulo}, {args.repeticoes} repetição(ões)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A primeira cria o banco (tabelas, migrações e admin); as demais o encontram pronto
+        primeira, pesados = medir_inicializacao(args.modulo, tmp)
+        tempos = [medir_inicializacao(args.modulo, tmp)[0] for _ in range(args.repeticoes)]
+
+    mediana = statistics.median(tempos)
+    print(f"{'banco novo':<28} {primeira * 1000:>10.1f} ms")
+    print(f"{'banco existente (mediana)':<28} {mediana * 1000:>10.1f} ms")
+    print(f"{'banco existente (máximo)':<28} {max(tempos) * 1000:>10.1f} ms")
+    print(f"📦 Módulos pesados carregados: {pesados or 'nenhum'}")
+
+    if mediana > args.alvo:
+        print(f"❌ Acima do alvo de {args.alvo * 1000:.0f} ms")
+        return 1
+    print(f"✅ Dentro do alvo de {args.alvo * 1000:.0f} ms")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do sistema de manutenção')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p = subparsers.add_parser('registrar', help='registrar_manutencao atual x anterior')
+    p.add_argument('-n', type=int, default=2000)
+    p.add_argument('--threads', type=int, default=4)
+    p.set_defaults(func=bench_registrar)
+
+    p = subparsers.add_parser('dashboard', help='KPIs do dashboard com laços x vetorizados')
+    p.add_argument('-n', type=int, default=50000)
+    p.add_argument('--repeticoes', type=int, default=5)
+    p.set_defaults(func=bench_dashboard)
+
+    p = subparsers.add_parser('inicializacao', help='tempo de import do app em um processo novo')
+    p.add_argument('--repeticoes', type=int, default=5)
+    p.add_argument('--modulo', default='web_app_completo')
+    p.add_argument('--alvo', type=float, default=0.5, help='mediana máxima em segundos')
+    p.set_defaults(func=bench_inicializacao)
+
+    args = parser.parse_args()
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,371 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from config import Config
+from datas import agora_epoch, SEGUNDOS_DIA
+
+# Status sem data de expiração (veículo sem manutenção registrada)
+NUNCA = float('inf')
+
+# Retorno de CacheLRU.obter quando a chave não está no cache
+AUSENTE = object()
+
+
+class CacheLRU:
+    """Cache limitado com descarte do item menos usado e validade (TTL).
+
+    Valores ``None`` também são guardados (ex.: placa inexistente); a
+    ausência é indicada por ``AUSENTE``. ``versao`` muda a cada
+    invalidação: quem leu do banco antes dela não grava o valor antigo.
+    """
+
+    def __init__(self, tamanho: int = None, ttl: float = None):
+        self.tamanho = tamanho or Config.CACHE_LRU_TAMANHO
+        self.ttl = ttl if ttl is not None else Config.CACHE_LRU_TTL_SEGUNDOS
+        self._itens: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.versao = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+
+    def obter(self, chave: Hashable) -> Any:
+        """Valor guardado ou ``AUSENTE``"""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[1] <= time.monotonic():
+                if item is not None:
+                    del self._itens[chave]
+                self.faltas += 1
+                return AUSENTE
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[0]
+
+    def guardar(self, chave: Hashable, valor: Any, versao: int = None):
+        """Guarda o valor, a menos que o cache tenha sido invalidado desde ``versao``"""
+        with self._lock:
+            if versao is not None and versao != self.versao:
+                return
+            self._itens[chave] = (valor, time.monotonic() + self.ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+                self.descartes += 1
+
+    def invalidar(self, chaves: Iterable[Hashable]):
+        """Remove as chaves informadas"""
+        with self._lock:
+            self.versao += 1
+            for chave in chaves:
+                self._itens.pop(chave, None)
+
+    def limpar(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self.versao += 1
+            self._itens.clear()
+
+    def estatisticas(self) -> Dict:
+        """Tamanho e taxa de acerto do cache"""
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                'entradas': len(self._itens),
+                'tamanho_max': self.tamanho,
+                'ttl_segundos': self.ttl,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'descartes': self.descartes,
+                'taxa_acerto': round(self.acertos / total * 100, 1) if total else 0.0
+            }
+
+
+class CacheStatusDiario:
+    """Status de manutenção por (placa, dia), com uma leitura do banco por dia.
+
+    O status só muda quando uma manutenção é registrada (``invalidar``) ou
+    quando os dias sem manutenção aumentam. Cada entrada guarda o instante
+    em que o próximo dia completa; até lá, a consulta é uma busca em
+    dicionário. Na virada do dia o cache inteiro é descartado, e o
+    agendador de ``BackupManager`` o reconstrói em lote à meia-noite.
+
+    ``carregar(placas)`` devolve as linhas de veículos das placas pedidas
+    (todas, se ``placas`` for None) e ``calcular(veiculo, agora)`` monta o
+    status de uma linha.
+    """
+
+    def __init__(self, carregar: Callable[[Optional[List[str]]], List[Dict]],
+                 calcular: Callable[[Optional[Dict], int], Dict]):
+        self._carregar = carregar
+        self._calcular = calcular
+        self._lock = threading.Lock()
+        self._dia = date.today()
+        self._entradas: Dict[str, tuple] = {}
+        self._versao = 0
+        self.acertos = 0
+        self.faltas = 0
+
+    def _novo_dia(self):
+        """Descarta as entradas de dias anteriores (chamado com o lock)"""
+        hoje = date.today()
+        if hoje != self._dia:
+            self._dia = hoje
+            self._entradas = {}
+
+    def _entrada(self, veiculo: Optional[Dict], agora: int) -> tuple:
+        """Calcula o status e o instante em que ele deixa de valer"""
+        status = self._calcular(veiculo, agora)
+        dias = status.get('dias')
+        if dias is None:
+            return status, NUNCA
+        return status, veiculo['ultima_manutencao'] + (dias + 1) * SEGUNDOS_DIA
+
+    def obter(self, placas: Iterable[str]) -> Dict[str, Dict]:
+        """Status das placas informadas; as ausentes do cache são lidas em uma consulta"""
+        agora = agora_epoch()
+        placas = [placa.upper() for placa in placas]
+        resultado = {}
+        faltando = []
+
+        with self._lock:
+            self._novo_dia()
+            for placa in placas:
+                entrada = self._entradas.get(placa)
+                if entrada is not None and agora < entrada[1]:
+                    resultado[placa] = entrada[0]
+                else:
+                    faltando.append(placa)
+            self.acertos += len(resultado)
+            self.faltas += len(faltando)
+            versao = self._versao
+
+        if faltando:
+            veiculos = {veiculo['placa']: veiculo for veiculo in self._carregar(faltando)}
+            novas = {placa: self._entrada(veiculos.get(placa), agora) for placa in faltando}
+            with self._lock:
+                # Uma manutenção registrada durante a leitura invalida o que foi lido
+                if versao == self._versao:
+                    self._entradas.update(novas)
+            resultado.update((placa, entrada[0]) for placa, entrada in novas.items())
+
+        return {placa: dict(resultado[placa]) for placa in placas}
+
+    def invalidar(self, placas: Iterable[str]):
+        """Remove as placas do cache (após registrar manutenções)"""
+        with self._lock:
+            self._versao += 1
+            for placa in placas:
+                self._entradas.pop(placa.upper(), None)
+
+    def limpar(self):
+        """Esvazia o cache (ex.: após restaurar um backup)"""
+        with self._lock:
+            self._versao += 1
+            self._entradas = {}
+
+    def reconstruir(self) -> int:
+        """Recalcula o status de toda a frota em uma única consulta"""
+        with self._lock:
+            versao = self._versao
+        agora = agora_epoch()
+        entradas = {veiculo['placa']: self._entrada(veiculo, agora)
+                    for veiculo in self._carregar(None)}
+
+        with self._lock:
+            if versao != self._versao:
+                return 0
+            self._dia = date.today()
+            self._entradas = entradas
+        return len(entradas)
+
+    def estatisticas(self) -> Dict:
+        """Tamanho e taxa de acerto do cache"""
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                'dia': self._dia.isoformat(),
+                'entradas': len(self._entradas),
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'taxa_acerto': round(self.acertos / total * 100, 1) if total else 0.0
+            }
+
+
+class CacheVersionado:
+    """Último resultado de um cálculo caro, válido enquanto a versão não muda.
+
+    ``obter(versao, calcular)`` devolve o resultado guardado se a versão for
+    a mesma e o TTL não tiver vencido (o TTL cobre o que muda só com o
+    tempo, como dias sem manutenção). Faltas simultâneas são agrupadas:
+    um único ``calcular()`` roda por vez e quem chega durante ele espera e
+    reaproveita o resultado.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calculo = threading.Lock()
+        self._versao = None
+        self._valor = None
+        self._expira = 0.0
+        self.acertos = 0
+        self.calculos = 0
+        self.agrupados = 0
+
+    def _valido(self, versao: Hashable) -> bool:
+        """Indica se o resultado guardado serve para a versão (chamado com o lock)"""
+        return self._versao == versao and time.monotonic() < self._expira
+
+    def obter(self, versao: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Resultado da versão, calculado no máximo uma vez por vez"""
+        with self._lock:
+            if self._valido(versao):
+                self.acertos += 1
+                return self._valor
+
+        with self._calculo:
+            # Outra requisição pode ter calculado enquanto esta esperava
+            with self._lock:
+                if self._valido(versao):
+                    self.agrupados += 1
+                    return self._valor
+
+            valor = calcular()
+            with self._lock:
+                self._versao = versao
+                self._valor = valor
+                self._expira = time.monotonic() + self.ttl
+                self.calculos += 1
+            return valor
+
+    def limpar(self):
+        """Descarta o resultado guardado"""
+        with self._lock:
+            self._versao = None
+            self._valor = None
+
+    def estatisticas(self) -> Dict:
+        """Acertos, cálculos e faltas agrupadas"""
+        with self._lock:
+            total = self.acertos + self.agrupados + self.calculos
+            return {
+                'versao': self._versao,
+                'ttl_segundos': self.ttl,
+                'acertos': self.acertos,
+                'agrupados': self.agrupados,
+                'calculos': self.calculos,
+                'taxa_acerto': round((self.acertos + self.agrupados) / total * 100, 1)
+                               if total else 0.0
+            }
+
+
+class SincronizadorCaches:
+    """Leva aos caches do processo as gravações feitas por outros processos.
+
+    Cada processo (worker do gunicorn, script, CLI) invalida os próprios
+    caches ao gravar, mas não vê as gravações dos demais. ``mudancas(marca)``
+    devolve a nova marca do banco e as placas alteradas desde ``marca``
+    (None: descartar tudo), e ``invalidar(placas)`` as remove dos caches.
+
+    A consulta ao banco roda no máximo uma vez por ``intervalo``; entre uma
+    e outra, ``sincronizar()`` só compara o relógio, então acertos de cache
+    não pagam ida ao banco.
+    """
+
+    def __init__(self, mudancas: Callable[[Any], tuple],
+                 invalidar: Callable[[Optional[List[str]]], None], intervalo: float = None):
+        self._mudancas = mudancas
+        self._invalidar = invalidar
+        self.intervalo = intervalo if intervalo is not None else Config.CACHE_SINCRONIZACAO_SEGUNDOS
+        self._lock = threading.Lock()
+        self._marca = None
+        self._proxima = 0.0
+        self.verificacoes = 0
+        self.sincronizacoes = 0
+
+    def sincronizar(self):
+        """Invalida o que outros processos alteraram (no máximo uma consulta por intervalo)"""
+        agora = time.monotonic()
+        if agora < self._proxima:
+            return
+        with self._lock:
+            if agora < self._proxima:
+                return
+            self._proxima = agora + self.intervalo
+            marca = self._marca
+            self.verificacoes += 1
+
+        nova, placas = self._mudancas(marca)
+        with self._lock:
+            # Outra thread já sincronizou a partir da mesma marca
+            if self._marca != marca or nova == marca:
+                return
+            self._marca = nova
+            self.sincronizacoes += 1
+        self._invalidar(placas)
+
+    def limpar(self):
+        """Esquece a marca: a próxima verificação descarta os caches"""
+        with self._lock:
+            self._marca = None
+            self._proxima = 0.0
+
+    def estatisticas(self) -> Dict:
+        """Verificações feitas no banco e quantas encontraram mudanças"""
+        with self._lock:
+            return {
+                'intervalo_segundos': self.intervalo,
+                'verificacoes': self.verificacoes,
+                'sincronizacoes': self.sincronizacoes
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def obter_cache(nome: str, db_path: str, criar: Callable[[], Any] = None):
+    """Cache ``nome`` do arquivo de banco, criado por ``criar()`` no primeiro uso.
+
+    Todo cache registrado aqui precisa de ``limpar()`` e ``estatisticas()``.
+    """
+    chave = (nome, os.path.abspath(db_path))
+    with _caches_lock:
+        cache = _caches.get(chave)
+        if cache is None and criar is not None:
+            cache = criar()
+            _caches[chave] = cache
+        return cache
+
+
+def obter_cache_status(db_path: str, carregar=None, calcular=None) -> Optional[CacheStatusDiario]:
+    """Cache de status compartilhado do arquivo de banco (criado no primeiro uso)"""
+    criar = (lambda: CacheStatusDiario(carregar, calcular)) if carregar is not None else None
+    return obter_cache('status', db_path, criar)
+
+
+def obter_cache_lru(db_path: str) -> CacheLRU:
+    """Cache de veículos e histórico recente compartilhado do arquivo de banco"""
+    return obter_cache('lru', db_path, CacheLRU)
+
+
+def limpar_caches(db_path: str):
+    """Esvazia todos os caches do arquivo de banco (ex.: após restaurar um backup)"""
+    caminho = os.path.abspath(db_path)
+    with _caches_lock:
+        caches = [cache for (_, arquivo), cache in _caches.items() if arquivo == caminho]
+    for cache in caches:
+        cache.limpar()
+
+
+def estatisticas_caches(db_path: str) -> Dict[str, Dict]:
+    """Contadores de todos os caches do arquivo de banco"""
+    caminho = os.path.abspath(db_path)
+    with _caches_lock:
+        caches = {nome: cache for (nome, arquivo), cache in _caches.items() if arquivo == caminho}
+    return {nome: cache.estatisticas() for nome, cache in caches.items()}
\ No newline at end of file
@@ -8,6 +8,44 @@ class Config:
     # Banco de dados
     DATABASE_PATH = 'manutencao.db'
     
+    # Pool de conexões SQLite
+    DB_POOL_TAMANHO = int(os.environ.get('DB_POOL_TAMANHO', 8))
+    # Conexões somente leitura (mode=ro) de dashboard e relatórios
+    DB_POOL_LEITURA_TAMANHO = int(os.environ.get('DB_POOL_LEITURA_TAMANHO', 4))
+    DB_POOL_TIMEOUT_SEGUNDOS = 10
+    DB_POOL_VERIFICAR_APOS_SEGUNDOS = 60
+    
+    # Perfil de armazenamento SQLite (aplicado em toda nova conexão)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negativo = KiB (64 MB)
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY'
+    }
+    SQLITE_CHECKPOINT_INTERVALO_SEGUNDOS = 300
+    SQLITE_OPTIMIZE_INTERVALO_SEGUNDOS = 3600
+    
+    # Gravação dos logs de auditoria em segundo plano
+    AUDITORIA_FILA_MAX = 10000
+    AUDITORIA_LOTE_MAX = 500
+    AUDITORIA_INTERVALO_SEGUNDOS = 1.0
+    # Fila cheia: 'sincrono' (grava na requisição), 'bloquear' ou 'descartar'
+    AUDITORIA_POLITICA_FILA_CHEIA = os.environ.get('AUDITORIA_POLITICA_FILA_CHEIA', 'sincrono')
+    AUDITORIA_BLOQUEIO_SEGUNDOS = 2
+    
+    # Retenção dos logs: mais antigos vão para arquivos mensais em LOGS_DIR
+    LOGS_RETENCAO_DIAS = 90
+    LOGS_ARQUIVAMENTO_HORARIO = "03:30"
+    
+    # Cache LRU de veículos e histórico recente por placa
+    CACHE_LRU_TAMANHO = 4096
+    CACHE_LRU_TTL_SEGUNDOS = 60
+    CACHE_HISTORICO_ITENS = 10
+    # Intervalo entre verificações de gravações feitas por outros processos
+    CACHE_SINCRONIZACAO_SEGUNDOS = 1.0
+    
     # Diretórios
     BACKUP_DIR = 'backups'
     EXPORTS_DIR = 'exports'
@@ -32,9 +70,23 @@ class Config:
     # Configurações da API
     API_TOKEN_EXPIRATION = timedelta(days=1)
     
+    # Registro de manutenções em lote
+    LOTE_MAX_REGISTROS = 5000
+    LOTE_DATA_FUTURA_SEGUNDOS = 300  # tolerância para relógios adiantados
+    
     # Configurações do dashboard
     DASHBOARD_REFRESH_SECONDS = 30
     MAX_HISTORICO_EXIBIR = 100
+    DASHBOARD_CACHE_TTL_SEGUNDOS = 60
+    GRAFICOS_CACHE_TTL_SEGUNDOS = 300
+    GRAFICOS_PROCESSOS = int(os.environ.get('GRAFICOS_PROCESSOS', 1))
+    GRAFICOS_TIMEOUT_SEGUNDOS = 60
+    GRAFICOS_MAX_AGE_SEGUNDOS = 30
+    RANKING_LIMITE_MAX = 100
+    RANKING_JANELA_MAX_DIAS = 3650
+    
+    # Paginação por cursor das listagens da API
+    PAGINA_MAX_ITENS = 1000
     
     # Tipos de manutenção disponíveis
     TIPOS_MANUTENCAO = [
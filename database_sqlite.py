@@ -1,17 +1,79 @@
 import sqlite3
-from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import json
 import os
+import re
+import threading
+from pool_conexoes import obter_pool, obter_pool_leitura
+from arquivo_logs import ArquivoLogs
+from cache import obter_cache, obter_cache_status, obter_cache_lru, SincronizadorCaches, AUSENTE
+from migracoes import aplicar_migracoes, VERSAO_DASHBOARD
+from config import Config
+from datas import agora_epoch, para_epoch, dias_desde, SEGUNDOS_DIA
+from paginacao import (PaginacaoInvalidaError, normalizar_ordem, decodificar_cursor,
+                       clausulas_keyset, dividir_pagina)
+
+# Ordenações aceitas na listagem de veículos (expressões indexadas)
+ORDENACOES_VEICULOS = {
+    'placa': 'placa',
+    'ultima_manutencao': 'IFNULL(ultima_manutencao, 0)',
+    'id': 'id'
+}
+
+class LoteInvalidoError(ValueError):
+    """Lote de manutenções com registros inválidos"""
+    def __init__(self, erros: List[Dict]):
+        super().__init__(f'{len(erros)} registro(s) inválido(s) no lote')
+        self.erros = erros
+
+class BuscaIndisponivelError(RuntimeError):
+    """SQLite sem FTS5: o índice de busca textual não existe"""
+
+# Arquivos de banco cujas tabelas e migrações já foram verificadas neste processo
+_bancos_iniciados = set()
+_bancos_lock = threading.Lock()
+
+# Máximo de termos aceitos em uma busca textual
+BUSCA_MAX_TERMOS = 16
+
+def montar_consulta_fts(texto: str) -> str:
+    """Converte o texto livre em termos FTS5 entre aspas, com prefixo.
+
+    Operadores e aspas digitados pelo usuário viram texto comum, então a
+    consulta nunca gera erro de sintaxe do FTS5.
+    """
+    termos = re.findall(r'\w+', texto or '')[:BUSCA_MAX_TERMOS]
+    return ' '.join(f'"{termo}"*' for termo in termos)
 
 class DatabaseSQLite:
     def __init__(self, db_path='manutencao.db'):
         self.db_path = db_path
+        self.pool = obter_pool(db_path)
+        self.leitura = obter_pool_leitura(db_path)
+        self.arquivo_logs = ArquivoLogs(db_path)
+        self.cache = obter_cache_lru(db_path)
         self.init_database()
+        self.cache_status = obter_cache_status(db_path, self._veiculos_para_cache,
+                                               self._status_do_veiculo)
+        # Gravações de outros processos chegam aos caches por aqui
+        self.sincronizador = obter_cache(
+            'sincronizador', db_path,
+            lambda: SincronizadorCaches(self._mudancas_desde, self._descartar_alterados)
+        )
     
     def init_database(self):
-        """Inicializa o banco de dados e cria as tabelas"""
-        conn = sqlite3.connect(self.db_path)
+        """Inicializa o banco de dados e cria as tabelas (uma vez por processo e arquivo)"""
+        caminho = os.path.abspath(self.db_path)
+        with _bancos_lock:
+            if caminho in _bancos_iniciados:
+                return
+            with self.pool.conexao() as conn:
+                self._criar_tabelas(conn)
+                aplicar_migracoes(conn)
+            _bancos_iniciados.add(caminho)
+    
+    def _criar_tabelas(self, conn):
+        """Cria as tabelas que ainda não existem"""
         cursor = conn.cursor()
         
         # Tabela de veículos
@@ -79,128 +141,562 @@ class DatabaseSQLite:
         ''')
         
         conn.commit()
-        conn.close()
+    
+    def _conexao_leitura(self):
+        """Conexão para consultas: o snapshot somente leitura aberto nesta thread, se houver"""
+        if self.leitura.emprestada_nesta_thread():
+            return self.leitura.conexao()
+        return self.pool.conexao()
     
     def adicionar_veiculo(self, placa: str, modelo: str = None, ano: int = None, 
                          cor: str = None, observacoes: str = None) -> bool:
         """Adiciona um novo veículo"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO veiculos (placa, modelo, ano, cor, observacoes)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (placa.upper(), modelo, ano, cor, observacoes))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-        finally:
-            conn.close()
+        with self.pool.conexao() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('''
+                    INSERT INTO veiculos (placa, modelo, ano, cor, observacoes)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (placa.upper(), modelo, ano, cor, observacoes))
+                conn.commit()
+                self._invalidar_caches([placa.upper()])
+                return True
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                return False
     
     def registrar_manutencao(self, placa: str, tipo: str, tecnico: str = "Sistema", 
                            observacoes: str = "") -> Dict:
-        """Registra uma nova manutenção"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        data_atual = datetime.now()
+        """Registra uma nova manutenção em uma única transação"""
+        placa = placa.upper()
+        data_atual = agora_epoch()
         
-        # Verificar se veículo existe, se não, criar
-        veiculo = self.buscar_veiculo(placa)
-        if not veiculo:
-            self.adicionar_veiculo(placa)
+        with self.pool.transacao() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            
+            # Criar o veículo se não existir e atualizar sua última manutenção
+            cursor.execute('''
+                INSERT INTO veiculos (placa, ultima_manutencao, ultimo_tipo)
+                VALUES (?, ?, ?)
+                ON CONFLICT (placa) DO UPDATE SET
+                    ultima_manutencao = excluded.ultima_manutencao,
+                    ultimo_tipo = excluded.ultimo_tipo
+            ''', (placa, data_atual, tipo))
+            
+            # Inserir manutenção e devolver o registro criado
+            cursor.execute('''
+                INSERT INTO manutencoes (placa, tipo, tecnico, observacoes, data_manutencao)
+                VALUES (?, ?, ?, ?, ?)
+                RETURNING id, placa, data_manutencao, tipo, observacoes, tecnico
+            ''', (placa, tipo, tecnico, observacoes, data_atual))
+            
+            rows = cursor.fetchall()
         
-        # Inserir manutenção
-        cursor.execute('''
-            INSERT INTO manutencoes (placa, tipo, tecnico, observacoes, data_manutencao)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (placa.upper(), tipo, tecnico, observacoes, data_atual))
+        self._invalidar_caches([placa])
         
-        # Atualizar última manutenção do veículo
-        cursor.execute('''
-            UPDATE veiculos 
-            SET ultima_manutencao = ?, ultimo_tipo = ?
-            WHERE placa = ?
-        ''', (data_atual, tipo, placa.upper()))
+        if rows:
+            return dict(rows[0])
+        return {}
+    
+    def validar_lote(self, registros: List[Dict]) -> List[Dict]:
+        """Valida um lote de manutenções e retorna a lista de erros"""
+        if not isinstance(registros, list) or not registros:
+            return [{'indice': None, 'erro': 'Lote vazio ou em formato inválido'}]
+        
+        if len(registros) > Config.LOTE_MAX_REGISTROS:
+            return [{'indice': None,
+                     'erro': f'Lote excede o limite de {Config.LOTE_MAX_REGISTROS} registros'}]
+        
+        erros = []
+        limite_data = agora_epoch() + Config.LOTE_DATA_FUTURA_SEGUNDOS
+        for indice, registro in enumerate(registros):
+            if not isinstance(registro, dict):
+                erros.append({'indice': indice, 'erro': 'Registro deve ser um objeto'})
+                continue
+            
+            placa = registro.get('placa')
+            if not isinstance(placa, str) or not placa.strip():
+                erros.append({'indice': indice, 'erro': 'Placa obrigatória'})
+            
+            tipo = registro.get('tipo')
+            if not isinstance(tipo, str) or not tipo.strip():
+                erros.append({'indice': indice, 'erro': 'Tipo obrigatório'})
+            
+            for campo in ('observacoes', 'tecnico'):
+                if not isinstance(registro.get(campo), (str, type(None))):
+                    erros.append({'indice': indice, 'erro': f'Campo {campo} deve ser texto'})
+            
+            data = registro.get('data_manutencao')
+            if data is not None:
+                # bool é int para o Python (True viraria 1970); NaN vira None
+                try:
+                    epoch = None if isinstance(data, bool) else para_epoch(data)
+                except (ValueError, OverflowError, OSError):
+                    epoch = None
+                if epoch is None:
+                    erros.append({'indice': indice, 'erro': f'Data inválida: {data}'})
+                elif not 0 <= epoch <= limite_data:
+                    # Fora disso o rollup diário não tem dia (ou o SQLite não guarda o inteiro)
+                    erros.append({'indice': indice, 'erro': f'Data fora do intervalo aceito: {data}'})
+        
+        return erros
+    
+    def registrar_manutencoes_lote(self, registros: List[Dict], 
+                                   tecnico: str = "Sistema") -> Dict:
+        """Registra um lote de manutenções em uma única transação"""
+        erros = self.validar_lote(registros)
+        if erros:
+            raise LoteInvalidoError(erros)
+        
+        data_atual = agora_epoch()
+        linhas = []
+        ultimas = {}
+        
+        for registro in registros:
+            placa = registro['placa'].strip().upper()
+            data = registro.get('data_manutencao')
+            data = para_epoch(data) if data is not None else data_atual
+            
+            linhas.append((placa, registro['tipo'], registro.get('tecnico') or tecnico,
+                           registro.get('observacoes', ''), data))
+            
+            # Guardar apenas a manutenção mais recente de cada placa
+            if placa not in ultimas or data >= ultimas[placa][0]:
+                ultimas[placa] = (data, registro['tipo'])
         
-        conn.commit()
+        with self.pool.transacao() as conn:
+            cursor = conn.cursor()
+            
+            # Criar veículos que ainda não existem
+            cursor.executemany('''
+                INSERT OR IGNORE INTO veiculos (placa) VALUES (?)
+            ''', [(placa,) for placa in ultimas])
+            veiculos_criados = cursor.rowcount
+            
+            cursor.executemany('''
+                INSERT INTO manutencoes (placa, tipo, tecnico, observacoes, data_manutencao)
+                VALUES (?, ?, ?, ?, ?)
+            ''', linhas)
+            
+            # Atualizar a última manutenção uma vez por placa
+            cursor.executemany('''
+                UPDATE veiculos 
+                SET ultima_manutencao = ?, ultimo_tipo = ?
+                WHERE placa = ? 
+                  AND (ultima_manutencao IS NULL OR ultima_manutencao <= ?)
+            ''', [(data, tipo, placa, data) for placa, (data, tipo) in ultimas.items()])
         
-        # Buscar o registro inserido
-        cursor.execute('''
-            SELECT * FROM manutencoes WHERE id = last_insert_rowid()
-        ''')
+        self._invalidar_caches(ultimas)
         
-        row = cursor.fetchone()
-        conn.close()
+        return {
+            'inseridos': len(linhas),
+            'veiculos_criados': veiculos_criados,
+            'placas': sorted(ultimas)
+        }
+    
+    def _invalidar_caches(self, placas):
+        """Remove dos caches os dados das placas alteradas"""
+        placas = list(placas)
+        self.cache.invalidar([(tipo, placa) for placa in placas
+                              for tipo in ('veiculo', 'historico')])
+        self.cache_status.invalidar(placas)
+    
+    def _descartar_alterados(self, placas: Optional[List[str]]):
+        """Remove dos caches as placas alteradas por outros processos (None: tudo)"""
+        if placas is None:
+            self.cache.limpar()
+            self.cache_status.limpar()
+        else:
+            self._invalidar_caches(placas)
+    
+    def _usar_cache(self) -> bool:
+        """Dentro de um snapshot de leitura o cache é ignorado (poderia ser mais novo).
         
-        if row:
-            return {
-                'id': row[0],
-                'placa': row[1],
-                'data_manutencao': row[2],
-                'tipo': row[3],
-                'observacoes': row[4],
-                'tecnico': row[5]
-            }
-        return {}
+        Antes de usar o cache, aplica as gravações de outros processos.
+        """
+        if self.leitura.emprestada_nesta_thread():
+            return False
+        self.sincronizador.sincronizar()
+        return True
     
     def buscar_veiculo(self, placa: str) -> Optional[Dict]:
-        """Busca um veículo pela placa"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM veiculos WHERE placa = ?', (placa.upper(),))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return dict(row)
-        return None
+        """Busca um veículo pela placa (cache LRU)"""
+        placa = placa.upper()
+        usar_cache = self._usar_cache()
+        if usar_cache:
+            veiculo = self.cache.obter(('veiculo', placa))
+            if veiculo is not AUSENTE:
+                return dict(veiculo) if veiculo else None
+            versao = self.cache.versao
+        
+        with self._conexao_leitura() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            
+            cursor.execute('SELECT * FROM veiculos WHERE placa = ?', (placa,))
+            row = cursor.fetchone()
+        
+        veiculo = dict(row) if row else None
+        if usar_cache:
+            self.cache.guardar(('veiculo', placa), veiculo, versao)
+            return dict(veiculo) if veiculo else None
+        return veiculo
     
-    def buscar_historico(self, placa: str = None, limit: int = 100) -> List[Dict]:
-        """Busca histórico de manutenções"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+    def buscar_historico(self, placa: str = None, limit: int = 100, 
+                         cursor: str = None, ordem: str = 'desc') -> List[Dict]:
+        """Busca histórico de manutenções, continuando após o cursor se informado"""
+        ordem = normalizar_ordem(ordem)
+        
+        # Últimas manutenções de uma placa: servidas pelo cache LRU
+        if (placa and cursor is None and ordem == 'desc'
+                and limit <= Config.CACHE_HISTORICO_ITENS and self._usar_cache()):
+            chave = ('historico', placa.upper())
+            recentes = self.cache.obter(chave)
+            if recentes is AUSENTE:
+                versao = self.cache.versao
+                recentes = self._consultar_historico(placa, Config.CACHE_HISTORICO_ITENS,
+                                                     None, ordem)
+                self.cache.guardar(chave, recentes, versao)
+            return [dict(reg) for reg in recentes[:limit]]
+        
+        return self._consultar_historico(placa, limit, cursor, ordem)
+    
+    def _consultar_historico(self, placa: Optional[str], limit: int,
+                             cursor: Optional[str], ordem: str) -> List[Dict]:
+        """Consulta o histórico no banco por (data_manutencao, id)"""
+        condicao, ordenacao = clausulas_keyset('data_manutencao', ordem)
+        filtros = []
+        parametros = []
         
         if placa:
-            cursor.execute('''
-                SELECT * FROM manutencoes 
-                WHERE placa = ? 
-                ORDER BY data_manutencao DESC 
-                LIMIT ?
-            ''', (placa.upper(), limit))
-        else:
-            cursor.execute('''
+            filtros.append('placa = ?')
+            parametros.append(placa.upper())
+        
+        valores = decodificar_cursor(cursor, f'historico:{ordem}')
+        if valores:
+            filtros.append(condicao)
+            parametros.extend(valores)
+        
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+        
+        with self._conexao_leitura() as conn:
+            cur = conn.cursor()
+            cur.row_factory = sqlite3.Row
+            
+            cur.execute(f'''
                 SELECT * FROM manutencoes 
-                ORDER BY data_manutencao DESC 
+                {where}
+                {ordenacao}
                 LIMIT ?
-            ''', (limit,))
-        
-        rows = cursor.fetchall()
-        conn.close()
+            ''', (*parametros, limit))
+            
+            rows = cur.fetchall()
         
         return [dict(row) for row in rows]
     
-    def listar_veiculos(self) -> List[Dict]:
-        """Lista todos os veículos"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM veiculos ORDER BY placa')
-        rows = cursor.fetchall()
-        conn.close()
+    def pagina_historico(self, placa: str = None, limite: int = 100, 
+                         cursor: str = None, ordem: str = 'desc') -> Tuple[List[Dict], Optional[str]]:
+        """Retorna uma página do histórico e o cursor da próxima"""
+        ordem = normalizar_ordem(ordem)
+        linhas = self.buscar_historico(placa, limite + 1, cursor, ordem)
+        return dividir_pagina(linhas, limite, f'historico:{ordem}',
+                              lambda reg: [reg['data_manutencao'], reg['id']])
+    
+    def listar_veiculos(self, limite: int = None, cursor: str = None, 
+                        ordenar: str = 'placa', ordem: str = 'asc') -> List[Dict]:
+        """Lista os veículos, opcionalmente paginados por cursor"""
+        if ordenar not in ORDENACOES_VEICULOS:
+            raise PaginacaoInvalidaError(f'Ordenação inválida: {ordenar}')
+        ordem = normalizar_ordem(ordem)
+        condicao, ordenacao = clausulas_keyset(ORDENACOES_VEICULOS[ordenar], ordem)
+        
+        where = ''
+        parametros = []
+        valores = decodificar_cursor(cursor, f'veiculos:{ordenar}:{ordem}')
+        if valores:
+            where = f'WHERE {condicao}'
+            parametros.extend(valores)
+        
+        limit = ''
+        if limite is not None:
+            limit = 'LIMIT ?'
+            parametros.append(limite)
+        
+        with self._conexao_leitura() as conn:
+            cur = conn.cursor()
+            cur.row_factory = sqlite3.Row
+            
+            cur.execute(f'SELECT * FROM veiculos {where} {ordenacao} {limit}', parametros)
+            rows = cur.fetchall()
         
         return [dict(row) for row in rows]
     
-    def verificar_status(self, placa: str) -> Dict:
-        """Verifica status de manutenção do veículo"""
-        veiculo = self.buscar_veiculo(placa)
+    def pagina_veiculos(self, limite: int, cursor: str = None, ordenar: str = 'placa', 
+                        ordem: str = 'asc') -> Tuple[List[Dict], Optional[str]]:
+        """Retorna uma página de veículos e o cursor da próxima"""
+        ordem = normalizar_ordem(ordem)
+        linhas = self.listar_veiculos(limite + 1, cursor, ordenar, ordem)
+        
+        if ordenar == 'ultima_manutencao':
+            valores = lambda v: [v['ultima_manutencao'] or 0, v['id']]
+        else:
+            valores = lambda v: [v[ordenar], v['id']]
+        return dividir_pagina(linhas, limite, f'veiculos:{ordenar}:{ordem}', valores)
+    
+    def listar_logs(self, limit: int = 100, cursor: str = None, ordem: str = 'desc',
+                    inicio: int = None, fim: int = None) -> List[Dict]:
+        """Lista logs do sistema, continuando após o cursor se informado.
+
+        Com ``inicio`` (epoch), os meses já arquivados em LOGS_DIR que cruzam
+        o intervalo [inicio, fim) também são consultados.
+        """
+        ordem = normalizar_ordem(ordem)
+        condicao, ordenacao = clausulas_keyset('timestamp', ordem)
+        
+        filtros = []
+        parametros = []
+        valores = decodificar_cursor(cursor, f'logs:{ordem}')
+        if valores:
+            filtros.append(condicao)
+            parametros.extend(valores)
+        if inicio is not None:
+            filtros.append('timestamp >= ?')
+            parametros.append(inicio)
+        if fim is not None:
+            filtros.append('timestamp < ?')
+            parametros.append(fim)
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+        
+        def recentes(limite):
+            with self._conexao_leitura() as conn:
+                cur = conn.cursor()
+                cur.row_factory = sqlite3.Row
+                
+                cur.execute(f'''
+                    SELECT * FROM logs 
+                    {where}
+                    {ordenacao}
+                    LIMIT ?
+                ''', (*parametros, limite))
+                return [dict(row) for row in cur.fetchall()]
+        
+        def arquivados(limite):
+            if inicio is None or limite <= 0:
+                return []
+            return self.arquivo_logs.consultar(where, parametros, ordenacao, ordem,
+                                               limite, inicio, fim)
+        
+        # Os arquivos mensais guardam apenas logs mais antigos que a tabela principal
+        if ordem == 'desc':
+            logs = recentes(limit)
+            logs.extend(arquivados(limit - len(logs)))
+        else:
+            logs = arquivados(limit)
+            if len(logs) < limit:
+                logs.extend(recentes(limit - len(logs)))
+        return logs
+    
+    def pagina_logs(self, limite: int = 100, cursor: str = None, ordem: str = 'desc',
+                    inicio: int = None, fim: int = None) -> Tuple[List[Dict], Optional[str]]:
+        """Retorna uma página de logs e o cursor da próxima"""
+        ordem = normalizar_ordem(ordem)
+        linhas = self.listar_logs(limite + 1, cursor, ordem, inicio, fim)
+        return dividir_pagina(linhas, limite, f'logs:{ordem}',
+                              lambda log: [log['timestamp'], log['id']])
+    
+    def buscar_agregados(self, placa: str) -> Optional[Dict]:
+        """Totais pré-calculados de um veículo (mantidos por triggers)"""
+        with self._conexao_leitura() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            
+            cursor.execute('SELECT * FROM veiculos_agregados WHERE placa = ?', (placa.upper(),))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            
+            cursor.execute('''
+                SELECT tipo, quantidade FROM veiculos_agregados_tipos 
+                WHERE placa = ? ORDER BY quantidade DESC
+            ''', (placa.upper(),))
+            por_tipo = {tipo: quantidade for tipo, quantidade in cursor.fetchall()}
+        
+        agregados = dict(row)
+        agregados['por_tipo'] = por_tipo
+        return agregados
+    
+    def listar_agregados(self) -> Dict[str, Dict]:
+        """Totais pré-calculados de todos os veículos, por placa"""
+        with self._conexao_leitura() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute('SELECT * FROM veiculos_agregados')
+            rows = cursor.fetchall()
+        
+        return {row['placa']: dict(row) for row in rows}
+    
+    def versao_dados(self) -> str:
+        """Versão dos veículos e manutenções: muda a cada gravação.
+        
+        Inserções aumentam os maiores ids; edições, remoções e restaurações
+        mudam o contador ``dashboard`` de ``versoes_dados`` (triggers).
+        """
+        with self._conexao_leitura() as conn:
+            versao, veiculo, manutencao = conn.execute('''
+                SELECT (SELECT versao FROM versoes_dados WHERE nome = ?),
+                       (SELECT IFNULL(MAX(id), 0) FROM veiculos),
+                       (SELECT IFNULL(MAX(id), 0) FROM manutencoes)
+            ''', (VERSAO_DASHBOARD,)).fetchone()
+        return f'{versao}-{veiculo}-{manutencao}'
+    
+    def ranking_veiculos(self, limite: int = 10, dias: Optional[int] = None,
+                         por_tipo: bool = False) -> List[Dict]:
+        """Veículos com mais manutenções: de sempre ou dos últimos ``dias``.
+        
+        Sem janela, lê os agregados mantidos por triggers; com janela, faz
+        um único GROUP BY placa coberto pelo índice (placa, data_manutencao).
+        ``por_tipo`` acrescenta a quantidade de cada tipo por veículo.
+        """
+        corte = agora_epoch() - dias * SEGUNDOS_DIA if dias is not None else None
+        
+        with self._conexao_leitura() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            
+            if corte is None:
+                cursor.execute('''
+                    SELECT v.placa, a.total_manutencoes, v.ultima_manutencao, v.modelo
+                    FROM veiculos_agregados a
+                    JOIN veiculos v ON v.placa = a.placa
+                    ORDER BY a.total_manutencoes DESC, v.id
+                    LIMIT ?
+                ''', (limite,))
+            else:
+                cursor.execute('''
+                    SELECT v.placa, r.total_manutencoes, v.ultima_manutencao, v.modelo
+                    FROM (SELECT placa, COUNT(*) AS total_manutencoes
+                          FROM manutencoes
+                          WHERE data_manutencao >= ?
+                          GROUP BY placa) r
+                    JOIN veiculos v ON v.placa = r.placa
+                    ORDER BY r.total_manutencoes DESC, v.id
+                    LIMIT ?
+                ''', (corte, limite))
+            ranking = [dict(row) for row in cursor.fetchall()]
+            
+            # Completar com veículos sem manutenção quando a frota é pequena
+            if corte is None and len(ranking) < limite:
+                cursor.execute('''
+                    SELECT placa, 0 AS total_manutencoes, ultima_manutencao, modelo
+                    FROM veiculos
+                    WHERE placa NOT IN (SELECT placa FROM veiculos_agregados)
+                    ORDER BY id
+                    LIMIT ?
+                ''', (limite - len(ranking),))
+                ranking.extend(dict(row) for row in cursor.fetchall())
+            
+            if por_tipo:
+                tipos = self._tipos_por_veiculo(conn, [v['placa'] for v in ranking], corte)
+                for veiculo in ranking:
+                    veiculo['tipos'] = tipos.get(veiculo['placa'], {})
         
+        return ranking
+    
+    def _tipos_por_veiculo(self, conn, placas: List[str],
+                           corte: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """Quantidade de manutenções por tipo das placas (a partir de ``corte``)"""
+        if not placas:
+            return {}
+        marcadores = ', '.join('?' * len(placas))
+        if corte is None:
+            rows = conn.execute(f'''
+                SELECT placa, tipo, quantidade FROM veiculos_agregados_tipos
+                WHERE placa IN ({marcadores})
+            ''', placas).fetchall()
+        else:
+            rows = conn.execute(f'''
+                SELECT placa, tipo, COUNT(*) FROM manutencoes
+                WHERE placa IN ({marcadores}) AND data_manutencao >= ?
+                GROUP BY placa, tipo
+            ''', (*placas, corte)).fetchall()
+        
+        tipos = {}
+        for placa, tipo, quantidade in sorted(rows, key=lambda row: (-row[2], row[1])):
+            tipos.setdefault(placa, {})[tipo] = quantidade
+        return tipos
+    
+    def buscar_texto(self, texto: str, limite: int = 20, 
+                     cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """Busca em observações de manutenções e em modelos/observações de veículos.
+
+        Resultados ordenados por relevância (bm25, menor é melhor) e
+        paginados por cursor (rank, origem, id).
+        """
+        consulta = montar_consulta_fts(texto)
+        if not consulta:
+            return [], None
+        
+        valores = decodificar_cursor(cursor, 'busca')
+        if valores is not None and len(valores) != 3:
+            raise PaginacaoInvalidaError('Cursor inválido')
+        
+        params = {'consulta': consulta, 'n': limite + 1}
+        
+        def subconsulta(indice: str, origem: str) -> str:
+            filtro = ''
+            if valores is not None:
+                filtro = f"AND (rank, '{origem}', rowid) > (:rank, :origem, :id)"
+            return f'''
+                SELECT rowid, rank, snippet({indice}, -1, '[', ']', '…', 12) AS trecho
+                FROM {indice}
+                WHERE {indice} MATCH :consulta {filtro}
+                ORDER BY rank, rowid
+                LIMIT :n
+            '''
+        
+        if valores is not None:
+            params.update(rank=valores[0], origem=valores[1], id=valores[2])
+        
+        with self._conexao_leitura() as conn:
+            cursor_db = conn.cursor()
+            cursor_db.row_factory = sqlite3.Row
+            try:
+                cursor_db.execute(f'''
+                    SELECT * FROM (
+                        SELECT 'manutencao' AS origem, m.id, m.placa, m.tipo AS titulo,
+                               m.data_manutencao AS data, f.trecho, f.rank
+                        FROM ({subconsulta('manutencoes_fts', 'manutencao')}) f
+                        JOIN manutencoes m ON m.id = f.rowid
+                        UNION ALL
+                        SELECT 'veiculo' AS origem, v.id, v.placa, v.modelo AS titulo,
+                               v.ultima_manutencao AS data, f.trecho, f.rank
+                        FROM ({subconsulta('veiculos_fts', 'veiculo')}) f
+                        JOIN veiculos v ON v.id = f.rowid
+                    )
+                    ORDER BY rank, origem, id
+                    LIMIT :n
+                ''', params)
+            except sqlite3.OperationalError as e:
+                if 'no such table' in str(e) or 'no such module' in str(e):
+                    raise BuscaIndisponivelError('Busca textual indisponível (SQLite sem FTS5)')
+                raise
+            linhas = [dict(row) for row in cursor_db.fetchall()]
+        
+        return dividir_pagina(linhas, limite, 'busca',
+                              lambda item: [item['rank'], item['origem'], item['id']])
+    
+    def _classificar_status(self, dias: int) -> Dict:
+        """Classifica os dias sem manutenção em verde, amarelo ou vermelho"""
+        if dias < Config.ALERTA_AMARELO_DIAS:
+            return {'status': 'ok', 'cor': 'verde', 'mensagem': f'Em dia - {dias} dias'}
+        if dias < Config.ALERTA_VERMELHO_DIAS:
+            return {'status': 'atencao', 'cor': 'amarelo', 'mensagem': f'Atenção - {dias} dias'}
+        return {'status': 'critico', 'cor': 'vermelho', 'mensagem': f'Crítico - {dias} dias'}
+    
+    def _status_do_veiculo(self, veiculo: Optional[Dict], agora: int = None) -> Dict:
+        """Monta o status a partir de uma linha de veículo já carregada"""
         if not veiculo or not veiculo['ultima_manutencao']:
             return {
                 'status': 'nao_encontrado', 
@@ -209,85 +705,125 @@ class DatabaseSQLite:
                 'mensagem': 'Sem manutenção registrada'
             }
         
-        try:
-            ultima_manutencao = datetime.strptime(
-                veiculo['ultima_manutencao'], '%Y-%m-%d %H:%M:%S.%f'
-            )
-        except:
-            ultima_manutencao = datetime.strptime(
-                veiculo['ultima_manutencao'], '%Y-%m-%d %H:%M:%S'
-            )
-        
-        dias_diff = (datetime.now() - ultima_manutencao).days
+        dias_diff = dias_desde(veiculo['ultima_manutencao'], agora)
         
         status_info = {
-            'status': '',
             'dias': dias_diff,
-            'cor': '',
             'ultima_data': veiculo['ultima_manutencao'],
             'ultimo_tipo': veiculo.get('ultimo_tipo', 'N/A')
         }
-        
-        if dias_diff <= 6:
-            status_info['status'] = 'ok'
-            status_info['cor'] = 'verde'
-            status_info['mensagem'] = f'Em dia - {dias_diff} dias'
-        elif dias_diff <= 13:
-            status_info['status'] = 'atencao'
-            status_info['cor'] = 'amarelo'
-            status_info['mensagem'] = f'Atenção - {dias_diff} dias'
-        else:
-            status_info['status'] = 'critico'
-            status_info['cor'] = 'vermelho'
-            status_info['mensagem'] = f'Crítico - {dias_diff} dias'
+        status_info.update(self._classificar_status(dias_diff))
         
         return status_info
     
-    def get_estatisticas(self) -> Dict:
-        """Retorna estatísticas completas"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Total de veículos
-        cursor.execute('SELECT COUNT(*) FROM veiculos')
-        total_veiculos = cursor.fetchone()[0]
-        
-        # Status dos veículos
-        cursor.execute('SELECT placa, ultima_manutencao FROM veiculos WHERE ultima_manutencao IS NOT NULL')
-        veiculos = cursor.fetchall()
-        
-        verde = amarelo = vermelho = 0
-        dias_total = 0
+    def verificar_status(self, placa: str) -> Dict:
+        """Verifica status de manutenção do veículo (cache diário)"""
+        self.sincronizador.sincronizar()
+        return self.cache_status.obter([placa])[placa.upper()]
+    
+    def status_das_placas(self, placas: List[str]) -> Dict[str, Dict]:
+        """Status de várias placas pelo cache diário; as ausentes são lidas de uma vez"""
+        self.sincronizador.sincronizar()
+        return self.cache_status.obter(placas)
+    
+    def _veiculos_para_cache(self, placas: Optional[List[str]]) -> List[Dict]:
+        """Carrega as linhas usadas pelo cache de status (todas se placas for None)"""
+        if placas is None:
+            return self.listar_veiculos()
+        return self.buscar_veiculos(placas)
+    
+    def _mudancas_desde(self, marca: Optional[Tuple[int, int, int]]):
+        """Nova marca (versão, maiores ids de veículo e manutenção) e placas alteradas.
+        
+        Placas com veículo ou manutenção inseridos desde ``marca``, inclusive
+        por outros processos. Edições, remoções e restaurações mudam a versão:
+        nesse caso devolve None (descartar todos os caches).
+        """
+        with self._conexao_leitura() as conn:
+            nova = conn.execute('''
+                SELECT (SELECT versao FROM versoes_dados WHERE nome = ?),
+                       (SELECT IFNULL(MAX(id), 0) FROM veiculos),
+                       (SELECT IFNULL(MAX(id), 0) FROM manutencoes)
+            ''', (VERSAO_DASHBOARD,)).fetchone()
+            if marca is None or marca[0] != nova[0]:
+                return nova, None
+            if nova == marca:
+                return marca, []
+            placas = [row[0] for row in conn.execute('''
+                SELECT placa FROM veiculos WHERE id > ?
+                UNION
+                SELECT placa FROM manutencoes WHERE id > ?
+            ''', (marca[1], marca[2]))]
+        return nova, placas
+    
+    def status_para_veiculos(self, veiculos: List[Dict], 
+                             placas: List[str] = None) -> Dict[str, Dict]:
+        """Calcula o status de vários veículos já carregados, sem novas consultas.
+        
+        Se ``placas`` for informado, placas ausentes de ``veiculos`` aparecem
+        como não encontradas.
+        """
+        agora = agora_epoch()
+        por_placa = {veiculo['placa']: veiculo for veiculo in veiculos}
+        if placas is not None:
+            for placa in placas:
+                por_placa.setdefault(placa.upper(), None)
         
-        for placa, ultima in veiculos:
-            try:
-                ultima_dt = datetime.strptime(ultima, '%Y-%m-%d %H:%M:%S.%f')
-            except:
-                ultima_dt = datetime.strptime(ultima, '%Y-%m-%d %H:%M:%S')
-            dias = (datetime.now() - ultima_dt).days
-            dias_total += dias
+        return {
+            placa: self._status_do_veiculo(veiculo, agora)
+            for placa, veiculo in por_placa.items()
+        }
+    
+    def buscar_veiculos(self, placas: List[str]) -> List[Dict]:
+        """Busca vários veículos pela placa em uma única consulta"""
+        with self._conexao_leitura() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
             
-            if dias <= 6:
-                verde += 1
-            elif dias <= 13:
-                amarelo += 1
-            else:
-                vermelho += 1
-        
-        # Total de manutenções
-        cursor.execute('SELECT COUNT(*) FROM manutencoes')
-        total_manutencoes = cursor.fetchone()[0]
-        
-        # Manutenções por tipo
-        cursor.execute('''
-            SELECT tipo, COUNT(*) as quantidade 
-            FROM manutencoes 
-            GROUP BY tipo 
-            ORDER BY quantidade DESC
-        ''')
-        manutencoes_por_tipo = dict(cursor.fetchall())
+            cursor.execute('''
+                SELECT * FROM veiculos 
+                WHERE placa IN (SELECT value FROM json_each(?))
+            ''', (json.dumps([placa.upper() for placa in placas]),))
+            rows = cursor.fetchall()
         
-        conn.close()
+        return [dict(row) for row in rows]
+    
+    def get_estatisticas(self) -> Dict:
+        """Retorna estatísticas completas"""
+        with self._conexao_leitura() as conn:
+            cursor = conn.cursor()
+            
+            # Total de veículos e status calculados em uma única agregação
+            cursor.execute('''
+                SELECT COUNT(*),
+                       COUNT(dias),
+                       COALESCE(SUM(dias < :amarelo), 0),
+                       COALESCE(SUM(dias >= :amarelo AND dias < :vermelho), 0),
+                       COALESCE(SUM(dias >= :vermelho), 0),
+                       AVG(dias)
+                FROM (
+                    SELECT (:agora - ultima_manutencao) / 86400 AS dias
+                    FROM veiculos
+                )
+            ''', {
+                'agora': agora_epoch(),
+                'amarelo': Config.ALERTA_AMARELO_DIAS,
+                'vermelho': Config.ALERTA_VERMELHO_DIAS
+            })
+            (total_veiculos, com_manutencao, verde, amarelo, vermelho,
+             media_dias) = cursor.fetchone()
+            
+            # Manutenções por tipo (rollup diário)
+            cursor.execute('''
+                SELECT tipo, SUM(quantidade) as quantidade 
+                FROM manutencoes_diarias 
+                GROUP BY tipo 
+                ORDER BY quantidade DESC
+            ''')
+            manutencoes_por_tipo = dict(cursor.fetchall())
+            
+            # Total de manutenções
+            total_manutencoes = sum(manutencoes_por_tipo.values())
         
         return {
             'total_veiculos': total_veiculos,
@@ -296,32 +832,38 @@ class DatabaseSQLite:
             'vermelho': vermelho,
             'total_manutencoes': total_manutencoes,
             'manutencoes_por_tipo': manutencoes_por_tipo,
-            'media_dias_manutencao': round(dias_total / max(len(veiculos), 1), 1)
+            'media_dias_manutencao': round(media_dias or 0, 1)
         }
     
     def get_alertas(self) -> Dict:
         """Retorna alertas categorizados"""
-        veiculos = self.listar_veiculos()
+        agora = agora_epoch()
         alertas = {
             'amarelo': [],
             'vermelho': []
         }
         
-        for veiculo in veiculos:
-            if veiculo['ultima_manutencao']:
-                status = self.verificar_status(veiculo['placa'])
-                if status['dias'] > 6:
-                    alerta = {
-                        'placa': veiculo['placa'],
-                        'dias': status['dias'],
-                        'ultima_manutencao': veiculo['ultima_manutencao'],
-                        'ultimo_tipo': veiculo.get('ultimo_tipo', 'N/A'),
-                        'mensagem': status['mensagem']
-                    }
-                    if status['dias'] <= 13:
-                        alertas['amarelo'].append(alerta)
-                    else:
-                        alertas['vermelho'].append(alerta)
-        
-        return alertas
-    
\ No newline at end of file
+        # Apenas veículos a partir do limite amarelo (busca por faixa no índice)
+        with self._conexao_leitura() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute('''
+                SELECT placa, ultima_manutencao, ultimo_tipo,
+                       (? - ultima_manutencao) / 86400 AS dias
+                FROM veiculos
+                WHERE ultima_manutencao <= ?
+            ''', (agora, agora - Config.ALERTA_AMARELO_DIAS * SEGUNDOS_DIA))
+            rows = cursor.fetchall()
+        
+        for veiculo in sorted(rows, key=lambda row: row['placa']):
+            status = self._classificar_status(veiculo['dias'])
+            alerta = {
+                'placa': veiculo['placa'],
+                'dias': veiculo['dias'],
+                'ultima_manutencao': veiculo['ultima_manutencao'],
+                'ultimo_tipo': veiculo['ultimo_tipo'],
+                'mensagem': status['mensagem']
+            }
+            alertas[status['cor']].append(alerta)
+        
+        return alertas
\ No newline at end of file
@@ -0,0 +1,57 @@
+import math
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+# Datas são gravadas como inteiros (segundos desde 1970-01-01 UTC). As
+# colunas abaixo são convertidas para texto apenas na saída da API e dos
+# relatórios.
+CAMPOS_DATA = ('data_manutencao', 'ultima_manutencao', 'timestamp', 'ultima_data')
+
+FORMATO_DATA = '%Y-%m-%d %H:%M:%S'
+
+SEGUNDOS_DIA = 86400
+
+
+def agora_epoch() -> int:
+    """Retorna o instante atual em segundos desde a época"""
+    return int(time.time())
+
+
+def para_epoch(valor) -> Optional[int]:
+    """Converte datetime, texto ISO ou número para segundos desde a época"""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return int(valor.timestamp())
+    if isinstance(valor, (int, float)):
+        return None if math.isnan(valor) else int(valor)
+    return int(datetime.fromisoformat(str(valor)).timestamp())
+
+
+def formatar_epoch(valor, formato: str = FORMATO_DATA) -> Optional[str]:
+    """Converte segundos desde a época para texto no horário local"""
+    if valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, float) and math.isnan(valor):
+        return None
+    return datetime.fromtimestamp(int(valor)).strftime(formato)
+
+
+def dias_desde(valor, agora: int = None) -> Optional[int]:
+    """Dias completos entre a data informada (epoch) e agora"""
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return None
+    agora = agora if agora is not None else agora_epoch()
+    return int((agora - int(valor)) // SEGUNDOS_DIA)
+
+
+def formatar_datas(registro: Dict) -> Dict:
+    """Retorna cópia do registro com as colunas de data em texto"""
+    if registro is None:
+        return None
+    formatado = dict(registro)
+    for campo in CAMPOS_DATA:
+        if campo in formatado:
+            formatado[campo] = formatar_epoch(formatado[campo])
+    return formatado
\ No newline at end of file
@@ -0,0 +1,156 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List
+
+import numpy as np
+
+from cache import obter_cache
+from indice_frota import IndiceFrota, SEM_MANUTENCAO, selecionar_maiores
+from migracoes import DIA_LOCAL_SQL, VERSAO_DASHBOARD
+
+
+class EstadoDashboard:
+    """Estado do dashboard em memória, atualizado apenas com as linhas novas.
+
+    Guarda o maior ``id`` já aplicado de ``veiculos`` e de ``manutencoes``.
+    A cada ``atualizado()`` lê, em um snapshot, só as linhas acima dessas
+    marcas e as soma aos contadores por dia, mês e tipo e a um índice da
+    frota próprio (última manutenção e total por veículo), de onde saem
+    KPIs, tendências, ranking e alertas.
+
+    Edições e remoções de veículos ou manutenções mudam a versão
+    ``dashboard`` de ``versoes_dados`` (triggers), assim como restaurar um
+    backup; nesses casos o estado é reconstruído por completo.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._reconstruir_pendente = True
+        self.versao = None
+        self.ultimo_id_veiculo = 0
+        self.ultimo_id_manutencao = 0
+        self.frota: IndiceFrota = None
+        self.modelos: Dict[str, str] = {}
+        self.por_dia: Counter = Counter()
+        self.por_mes: Counter = Counter()
+        self.por_tipo: Counter = Counter()
+        self.total = 0
+        self.reconstrucoes = 0
+        self.atualizacoes = 0
+        self.linhas_aplicadas = 0
+
+    @contextmanager
+    def atualizado(self):
+        """Aplica as mudanças pendentes e mantém o estado travado durante o bloco"""
+        with self._lock:
+            with self.pool.snapshot() as conn:
+                versao = conn.execute(
+                    'SELECT versao FROM versoes_dados WHERE nome = ?', (VERSAO_DASHBOARD,)
+                ).fetchone()[0]
+                if self._reconstruir_pendente or versao != self.versao:
+                    self._reconstruir(conn, versao)
+                else:
+                    self._aplicar_novas(conn)
+            yield self
+
+    def _reconstruir(self, conn, versao: int):
+        """Carrega o estado inteiro (chamado com o lock, dentro do snapshot)"""
+        self._reconstruir_pendente = True
+        # A conexão do snapshot é reaproveitada pelo índice (mesma thread)
+        self.frota = IndiceFrota(self.pool)
+        self.modelos = dict(conn.execute('SELECT placa, modelo FROM veiculos'))
+        self.ultimo_id_veiculo = conn.execute(
+            'SELECT IFNULL(MAX(id), 0) FROM veiculos').fetchone()[0]
+        self.ultimo_id_manutencao = conn.execute(
+            'SELECT IFNULL(MAX(id), 0) FROM manutencoes').fetchone()[0]
+
+        self.por_dia, self.por_mes, self.por_tipo = Counter(), Counter(), Counter()
+        self.total = 0
+        for dia, tipo, quantidade in conn.execute('''
+            SELECT dia, tipo, SUM(quantidade) FROM manutencoes_diarias GROUP BY dia, tipo
+        '''):
+            self._somar(dia, tipo, quantidade)
+
+        self.versao = versao
+        self.reconstrucoes += 1
+        self._reconstruir_pendente = False
+
+    def _aplicar_novas(self, conn):
+        """Aplica veículos e manutenções acima das marcas (com o lock, no snapshot)"""
+        # Uma falha no meio deixaria o estado pela metade: reconstrói na próxima
+        self._reconstruir_pendente = True
+        for id_veiculo, placa, modelo in conn.execute(
+            'SELECT id, placa, modelo FROM veiculos WHERE id > ? ORDER BY id',
+            (self.ultimo_id_veiculo,)
+        ):
+            self.frota.adicionar_veiculo(placa)
+            self.modelos[placa] = modelo
+            self.ultimo_id_veiculo = id_veiculo
+
+        linhas = conn.execute(f'''
+            SELECT id, placa, tipo, data_manutencao, {DIA_LOCAL_SQL.format(coluna='data_manutencao')}
+            FROM manutencoes
+            WHERE id > ? AND data_manutencao IS NOT NULL
+            ORDER BY id
+        ''', (self.ultimo_id_manutencao,)).fetchall()
+        if linhas:
+            self.frota.registrar((placa, data, tipo) for _, placa, tipo, data, _ in linhas)
+            for _, _, tipo, _, dia in linhas:
+                self._somar(dia, tipo, 1)
+            self.linhas_aplicadas += len(linhas)
+        self.ultimo_id_manutencao = conn.execute(
+            'SELECT IFNULL(MAX(id), ?) FROM manutencoes', (self.ultimo_id_manutencao,)).fetchone()[0]
+
+        self.atualizacoes += 1
+        self._reconstruir_pendente = False
+
+    def _somar(self, dia: str, tipo: str, quantidade: int):
+        """Soma manutenções aos contadores por dia, mês e tipo"""
+        self.por_dia[dia] += quantidade
+        self.por_mes[dia[:7]] += quantidade
+        self.por_tipo[tipo] += quantidade
+        self.total += quantidade
+
+    def ranking(self, limite: int) -> List[Dict]:
+        """Veículos com mais manutenções (empates pela ordem de cadastro)"""
+        total = self.frota.total[:len(self.frota.placas)]
+        slots = list(selecionar_maiores(total, limite, 1))
+        # Completar com veículos sem manutenção quando a frota é pequena
+        if len(slots) < limite:
+            slots.extend(np.flatnonzero(total == 0)[:limite - len(slots)])
+
+        ranking = []
+        for slot in slots:
+            placa = self.frota.placas[slot]
+            ultima = int(self.frota.ultima[slot])
+            ranking.append({
+                'placa': placa,
+                'total_manutencoes': int(total[slot]),
+                'ultima_manutencao': None if ultima == SEM_MANUTENCAO else ultima,
+                'modelo': self.modelos.get(placa)
+            })
+        return ranking
+
+    def limpar(self):
+        """Força a reconstrução na próxima leitura (ex.: após restaurar um backup)"""
+        with self._lock:
+            self._reconstruir_pendente = True
+
+    def estatisticas(self) -> Dict:
+        """Marcas aplicadas e contadores de atualização"""
+        with self._lock:
+            return {
+                'versao': self.versao,
+                'ultimo_id_veiculo': self.ultimo_id_veiculo,
+                'ultimo_id_manutencao': self.ultimo_id_manutencao,
+                'reconstrucoes': self.reconstrucoes,
+                'atualizacoes': self.atualizacoes,
+                'linhas_aplicadas': self.linhas_aplicadas
+            }
+
+
+def obter_estado_dashboard(db_path: str, pool) -> EstadoDashboard:
+    """Estado do dashboard compartilhado do arquivo de banco"""
+    return obter_cache('dashboard', db_path, lambda: EstadoDashboard(pool))
\ No newline at end of file
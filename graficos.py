@@ -0,0 +1,311 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as PrazoEsgotado
+from concurrent.futures import process as processos_futures
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Callable, Dict, Tuple
+
+from cache import CacheVersionado, obter_cache
+from config import Config
+
+# O matplotlib só é importado para renderizar (em geral, nos processos do
+# renderizador): importar este módulo não pesa na inicialização do servidor
+ESTILO = 'seaborn-v0_8-darkgrid'
+COR_FUNDO = '#f8f9fa'
+
+# Formatos de imagem aceitos -> tipo MIME
+FORMATOS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# Estilo e rc_context alteram o rcParams global: uma renderização por vez
+# no processo (importa com GRAFICOS_PROCESSOS = 0, que renderiza nas threads)
+_rc_lock = threading.Lock()
+
+
+class GraficosIndisponiveisError(RuntimeError):
+    """Renderização sem resposta no prazo ou processo de renderização encerrado"""
+
+
+def _desenhar_status(ax, series: Dict):
+    """Pizza com os veículos em dia, em atenção e críticos"""
+    status_counts = series['status']
+    if sum(status_counts.values()) > 0:
+        colors = ['#00C851', '#ffbb33', '#ff4444']
+        wedges, texts, autotexts = ax.pie(
+            list(status_counts.values()),
+            labels=list(status_counts.keys()),
+            colors=colors,
+            autopct='%1.1f%%',
+            startangle=90,
+            textprops={'fontsize': 12, 'fontweight': 'bold'}
+        )
+        for autotext in autotexts:
+            autotext.set_color('white')
+            autotext.set_fontweight('bold')
+    ax.set_title('Status dos Veículos', fontsize=14, fontweight='bold')
+
+
+def _desenhar_tipos(ax, series: Dict):
+    """Barras com os tipos de manutenção mais comuns"""
+    tipos = series['tipos']
+    if tipos:
+        bars = ax.barh(list(tipos.keys()), list(tipos.values()), color='#667eea')
+        ax.set_title('Top 5 Tipos de Manutenção', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Quantidade')
+        for bar in bars:
+            width = bar.get_width()
+            ax.text(width + 0.1, bar.get_y() + bar.get_height()/2,
+                    f'{int(width)}', ha='left', va='center', fontweight='bold')
+
+
+def _desenhar_mensal(ax, series: Dict):
+    """Linha com as manutenções dos últimos meses"""
+    mensal = series['mensal']
+    if mensal:
+        ax.plot(range(len(mensal)), list(mensal.values()),
+                marker='o', linewidth=2, markersize=8, color='#764ba2')
+        ax.set_title('Tendência de Manutenções', fontsize=14, fontweight='bold')
+        ax.set_xticks(range(len(mensal)))
+        ax.set_xticklabels(list(mensal.keys()), rotation=45)
+        ax.grid(True, alpha=0.3)
+        ax.set_ylabel('Quantidade')
+
+
+def _desenhar_dias(ax, series: Dict):
+    """Histograma dos dias sem manutenção (contagens já calculadas por faixa)"""
+    dias = series['dias']
+    if dias['contagens']:
+        limites = dias['limites']
+        ax.hist(limites[:-1], bins=limites, weights=dias['contagens'],
+                color='#ff6b6b', edgecolor='white', alpha=0.7)
+        ax.set_title('Distribuição de Dias sem Manutenção', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Dias')
+        ax.set_ylabel('Quantidade de Veículos')
+        ax.axvline(x=7, color='#ffbb33', linestyle='--', linewidth=2, label='Alerta (7 dias)')
+        ax.axvline(x=14, color='#ff4444', linestyle='--', linewidth=2, label='Crítico (14 dias)')
+        ax.legend()
+
+
+# Gráficos do painel, na ordem das posições da grade 2x2
+GRAFICOS = {
+    'status': _desenhar_status,
+    'tipos': _desenhar_tipos,
+    'mensal': _desenhar_mensal,
+    'dias': _desenhar_dias
+}
+
+
+def versao_series(series: Dict) -> str:
+    """Resumo do conteúdo das séries: muda só quando o gráfico mudaria"""
+    return hashlib.sha256(json.dumps(series, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+def _preparar_processo():
+    """Aquece o processo de renderização antes do primeiro gráfico.
+
+    Desenha uma figura vazia: importa o matplotlib e o backend Agg e carrega
+    as fontes, custos que cairiam na primeira requisição.
+    """
+    _salvar(_figura((1, 1)), 'png')
+
+
+def _figura(tamanho: Tuple[float, float]):
+    """Figura com canvas Agg próprio, sem o estado global do pyplot"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=tamanho)
+    FigureCanvasAgg(fig)
+    fig.patch.set_facecolor(COR_FUNDO)
+    return fig
+
+
+def _salvar(fig, formato: str) -> bytes:
+    """Bytes da figura no formato pedido (SVG sem data e com ids fixos: reproduzível)"""
+    import matplotlib
+
+    buffer = BytesIO()
+    with matplotlib.rc_context({'svg.hashsalt': 'graficos'}):
+        fig.savefig(buffer, format=formato, dpi=100, bbox_inches='tight', facecolor=COR_FUNDO,
+                    metadata={'Date': None} if formato == 'svg' else None)
+    return buffer.getvalue()
+
+
+def renderizar_painel(series: Dict) -> bytes:
+    """Renderiza os quatro gráficos em um PNG 2x2 (nos processos do renderizador)"""
+    import matplotlib.style
+
+    with _rc_lock, matplotlib.style.context(ESTILO):
+        fig = _figura((15, 10))
+        for ax, desenhar in zip(fig.subplots(2, 2).flat, GRAFICOS.values()):
+            desenhar(ax, series)
+        fig.tight_layout()
+        return _salvar(fig, 'png')
+
+
+def renderizar_grafico(nome: str, series: Dict, formato: str = 'png') -> bytes:
+    """Renderiza um único gráfico do painel em PNG ou SVG"""
+    import matplotlib.style
+
+    with _rc_lock, matplotlib.style.context(ESTILO):
+        fig = _figura((7.5, 5))
+        GRAFICOS[nome](fig.add_subplot(), series)
+        fig.tight_layout()
+        return _salvar(fig, formato)
+
+
+class RenderizadorGraficos:
+    """Renderiza os gráficos fora da requisição, com cache por conteúdo.
+
+    ``series()`` devolve as séries atuais de cada gráfico. Cada imagem (o
+    painel e cada gráfico em PNG ou SVG) fica guardada pela versão das
+    suas próprias séries, então só é refeita quando o que ela mostra muda.
+    A renderização roda em um pool de processos; ``agendar()`` renderiza
+    em segundo plano após gravações, então a leitura costuma ser só cache.
+    Com ``GRAFICOS_PROCESSOS = 0`` a renderização roda na própria thread.
+    """
+
+    def __init__(self, series: Callable[[], Dict], processos: int = None):
+        self.series = series
+        self.processos = processos if processos is not None else Config.GRAFICOS_PROCESSOS
+        self._caches: Dict[Tuple[str, str], CacheVersionado] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._agendado = False
+        self.erros = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Pool de processos, criado na primeira renderização deste processo.
+
+        Nada é criado no import: scripts que importam a API não abrem
+        processos, e com gunicorn --preload cada worker cria o seu pool (um
+        pool criado antes de um fork não atende o processo filho). Usa
+        ``fork`` onde existe: com ``spawn``/``forkserver`` o módulo principal
+        seria reimportado, e o web_app abre o banco e inicia threads no
+        import. O processo filho só renderiza; não usa as conexões herdadas.
+        """
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                metodos = multiprocessing.get_all_start_methods()
+                contexto = multiprocessing.get_context('fork' if 'fork' in metodos else None)
+                self._executor = ProcessPoolExecutor(max_workers=self.processos,
+                                                     mp_context=contexto,
+                                                     initializer=_preparar_processo)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _pool_desligado(self) -> bool:
+        """Pool desligado (encerramento do processo): não aceita novas tarefas"""
+        if processos_futures._global_shutdown:
+            return True
+        executor = self._executor
+        return executor is not None and executor._shutdown_thread
+
+    def _renderizar(self, funcao: Callable[..., bytes], *args) -> bytes:
+        """Renderiza no pool de processos (ou na thread atual, sem pool)"""
+        if not self.processos:
+            return funcao(*args)
+        try:
+            return self._pool().submit(funcao, *args).result(
+                timeout=Config.GRAFICOS_TIMEOUT_SEGUNDOS)
+        except PrazoEsgotado:
+            raise GraficosIndisponiveisError(
+                f'Gráfico não renderizado em {Config.GRAFICOS_TIMEOUT_SEGUNDOS}s')
+        except BrokenProcessPool:
+            # Um processo morreu: o próximo uso cria um pool novo
+            with self._lock:
+                self._executor = None
+            raise GraficosIndisponiveisError('Processo de renderização encerrado')
+
+    def _em_cache(self, chave: Tuple[str, str], series: Dict,
+                  funcao: Callable[..., bytes], *args) -> Tuple[bytes, str]:
+        """Imagem e ETag guardadas pela versão das séries"""
+        with self._lock:
+            cache = self._caches.get(chave)
+            if cache is None:
+                cache = self._caches[chave] = CacheVersionado(Config.GRAFICOS_CACHE_TTL_SEGUNDOS)
+
+        def calcular():
+            imagem = self._renderizar(funcao, *args)
+            return imagem, hashlib.sha256(imagem).hexdigest()[:32]
+
+        return cache.obter(versao_series(series), calcular)
+
+    def _painel(self, series: Dict) -> bytes:
+        """PNG do painel 2x2 para as séries informadas"""
+        return self._em_cache(('painel', 'png'), series, renderizar_painel, series)[0]
+
+    def _grafico(self, series: Dict, nome: str, formato: str) -> Tuple[bytes, str]:
+        """Um gráfico para as séries informadas"""
+        serie = {nome: series[nome]}
+        return self._em_cache((nome, formato), serie, renderizar_grafico, nome, serie, formato)
+
+    def obter(self) -> bytes:
+        """PNG do painel para os dados atuais"""
+        return self._painel(self.series())
+
+    def obter_grafico(self, nome: str, formato: str = 'png') -> Tuple[bytes, str]:
+        """Imagem e ETag de um gráfico (``GRAFICOS``) no formato pedido (``FORMATOS``)"""
+        if nome not in GRAFICOS or formato not in FORMATOS:
+            raise KeyError(f'{nome}.{formato}')
+        return self._grafico(self.series(), nome, formato)
+
+    def agendar(self):
+        """Renderiza em segundo plano para os dados atuais (após gravações)"""
+        with self._lock:
+            if self._agendado:
+                return
+            self._agendado = True
+        threading.Thread(target=self._pre_renderizar, daemon=True,
+                         name='pre-renderizar-graficos').start()
+
+    def _pre_renderizar(self):
+        """Corpo da thread de ``agendar``: painel e gráficos em PNG"""
+        # Gravações feitas durante a renderização agendam outra
+        with self._lock:
+            self._agendado = False
+        try:
+            series = self.series()
+            self._painel(series)
+            for nome in GRAFICOS:
+                self._grafico(series, nome, 'png')
+        except GraficosIndisponiveisError as e:
+            self.erros += 1
+            print(f"❌ Erro ao pré-renderizar gráficos: {e}")
+        except RuntimeError as e:
+            # Pool já desligado no encerramento do processo: nada a pré-renderizar
+            if not self._pool_desligado():
+                self.erros += 1
+                print(f"❌ Erro ao pré-renderizar gráficos: {e}")
+        except Exception as e:
+            self.erros += 1
+            print(f"❌ Erro ao pré-renderizar gráficos: {e}")
+
+    def limpar(self):
+        """Descarta as imagens guardadas (ex.: após restaurar um backup)"""
+        with self._lock:
+            caches = list(self._caches.values())
+        for cache in caches:
+            cache.limpar()
+
+    def estatisticas(self) -> Dict:
+        """Contadores dos caches de imagens"""
+        with self._lock:
+            caches = dict(self._caches)
+        estatisticas = [cache.estatisticas() for cache in caches.values()]
+        return {
+            'imagens': len(caches),
+            'acertos': sum(e['acertos'] + e['agrupados'] for e in estatisticas),
+            'renderizacoes': sum(e['calculos'] for e in estatisticas),
+            'processos': self.processos,
+            'erros': self.erros
+        }
+
+
+def obter_renderizador(db_path: str, series: Callable[[], Dict]) -> RenderizadorGraficos:
+    """Renderizador compartilhado do arquivo de banco"""
+    return obter_cache('graficos', db_path, lambda: RenderizadorGraficos(series))
\ No newline at end of file
@@ -0,0 +1,134 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from datas import agora_epoch, SEGUNDOS_DIA
+
+# Valor de ``ultima`` para veículos sem manutenção registrada
+SEM_MANUTENCAO = np.iinfo(np.int64).min
+
+# Código de tipo para veículos sem manutenção
+SEM_TIPO = -1
+
+
+def selecionar_maiores(dias: np.ndarray, limite: int, minimo_dias: int) -> np.ndarray:
+    """Posições dos ``limite`` maiores valores a partir de ``minimo_dias``.
+
+    Ordenadas do maior para o menor; empates ficam na ordem das posições.
+    A seleção é parcial (``np.partition``), sem ordenar o array inteiro.
+    """
+    candidatos = np.flatnonzero(dias >= minimo_dias)
+    if len(candidatos) > limite:
+        # Tudo acima do corte e, no corte, as primeiras posições
+        k = len(candidatos) - limite
+        corte = np.partition(dias[candidatos], k)[k]
+        acima = candidatos[dias[candidatos] > corte]
+        no_corte = candidatos[dias[candidatos] == corte][:limite - len(acima)]
+        candidatos = np.concatenate([acima, no_corte])
+    return candidatos[np.lexsort((candidatos, -dias[candidatos]))]
+
+
+class IndiceFrota:
+    """Índice da frota em memória, em arrays NumPy indexados por slot.
+
+    Cada veículo ocupa um slot (``placa -> slot``) com a data da última
+    manutenção (epoch), o código do último tipo e o total de manutenções.
+    Status, histograma de dias e alertas viram operações vetorizadas sobre
+    poucos MB, sem montar DataFrames a partir de ``SELECT * FROM veiculos``.
+
+    O índice é carregado por ``carregar`` e atualizado por ``registrar``;
+    o estado do dashboard (``EstadoDashboard``) mantém o seu com as linhas
+    novas lidas do banco.
+    """
+
+    def __init__(self, pool, capacidade: int = 1024):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._iniciar_arrays(capacidade)
+        self.carregar()
+
+    def _iniciar_arrays(self, capacidade: int):
+        """Arrays vazios com a capacidade informada"""
+        self.placas: List[str] = []
+        self.slots: Dict[str, int] = {}
+        self.tipos: List[str] = []
+        self.codigos_tipo: Dict[str, int] = {}
+        self.ultima = np.full(capacidade, SEM_MANUTENCAO, dtype=np.int64)
+        self.tipo = np.full(capacidade, SEM_TIPO, dtype=np.int16)
+        self.total = np.zeros(capacidade, dtype=np.int32)
+
+    def _codigo_tipo(self, tipo: Optional[str]) -> int:
+        """Código numérico do tipo de manutenção (criado na primeira vez)"""
+        if tipo is None:
+            return SEM_TIPO
+        codigo = self.codigos_tipo.get(tipo)
+        if codigo is None:
+            codigo = len(self.tipos)
+            self.tipos.append(tipo)
+            self.codigos_tipo[tipo] = codigo
+        return codigo
+
+    def _slot(self, placa: str) -> int:
+        """Slot da placa, alocando um novo (e crescendo os arrays) se preciso"""
+        slot = self.slots.get(placa)
+        if slot is not None:
+            return slot
+
+        slot = len(self.placas)
+        if slot == len(self.ultima):
+            capacidade = len(self.ultima) * 2
+            self.ultima = np.concatenate(
+                [self.ultima, np.full(capacidade - slot, SEM_MANUTENCAO, dtype=np.int64)])
+            self.tipo = np.concatenate(
+                [self.tipo, np.full(capacidade - slot, SEM_TIPO, dtype=np.int16)])
+            self.total = np.concatenate(
+                [self.total, np.zeros(capacidade - slot, dtype=np.int32)])
+
+        self.placas.append(placa)
+        self.slots[placa] = slot
+        return slot
+
+    def carregar(self):
+        """(Re)carrega o índice inteiro do banco em uma consulta"""
+        with self.pool.conexao() as conn:
+            linhas = conn.execute('''
+                SELECT v.placa, v.ultima_manutencao, v.ultimo_tipo,
+                       IFNULL(a.total_manutencoes, 0)
+                FROM veiculos v
+                LEFT JOIN veiculos_agregados a ON a.placa = v.placa
+                ORDER BY v.id
+            ''').fetchall()
+
+        with self._lock:
+            self._iniciar_arrays(max(len(linhas) * 2, 1024))
+            for placa, ultima, tipo, total in linhas:
+                slot = self._slot(placa)
+                if ultima is not None:
+                    self.ultima[slot] = ultima
+                    self.tipo[slot] = self._codigo_tipo(tipo)
+                self.total[slot] = total
+
+    def adicionar_veiculo(self, placa: str):
+        """Reserva o slot de um veículo recém-cadastrado"""
+        with self._lock:
+            self._slot(placa)
+
+    def registrar(self, manutencoes: Iterable[Tuple[str, int, str]]):
+        """Aplica manutenções gravadas: (placa, data_manutencao, tipo)"""
+        with self._lock:
+            for placa, data, tipo in manutencoes:
+                slot = self._slot(placa)
+                self.total[slot] += 1
+                if data >= self.ultima[slot]:
+                    self.ultima[slot] = data
+                    self.tipo[slot] = self._codigo_tipo(tipo)
+
+    def dias_sem_manutencao(self, agora: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Slots com manutenção e os dias completos desde a última"""
+        agora = agora if agora is not None else agora_epoch()
+        with self._lock:
+            ultima = self.ultima[:len(self.placas)]
+            slots = np.flatnonzero(ultima != SEM_MANUTENCAO)
+            dias = (agora - ultima[slots]) // SEGUNDOS_DIA
+        return slots, dias
\ No newline at end of file
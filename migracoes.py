@@ -0,0 +1,490 @@
+import sqlite3
+from typing import Dict, List
+
+INDICES_V1 = [
+    'CREATE INDEX IF NOT EXISTS idx_manutencoes_placa_data '
+    'ON manutencoes (placa, data_manutencao)',
+    'CREATE INDEX IF NOT EXISTS idx_manutencoes_data '
+    'ON manutencoes (data_manutencao)',
+    'CREATE INDEX IF NOT EXISTS idx_manutencoes_tipo '
+    'ON manutencoes (tipo)',
+    'CREATE INDEX IF NOT EXISTS idx_logs_timestamp '
+    'ON logs (timestamp)'
+]
+
+# Valor padrão das colunas de data: segundos desde a época (UTC)
+AGORA_EPOCH_SQL = "(CAST(strftime('%s', 'now') AS INTEGER))"
+
+
+def _texto_para_epoch(coluna: str, horario_local: bool) -> str:
+    """Expressão SQL que converte datas em texto para segundos desde a época"""
+    modificador = ", 'utc'" if horario_local else ''
+    return (f"CASE WHEN typeof({coluna}) = 'text' "
+            f"THEN CAST(strftime('%s', {coluna}{modificador}) AS INTEGER) "
+            f"ELSE {coluna} END")
+
+
+def _reconstruir_tabela(conn: sqlite3.Connection, tabela: str, criar_sql: str,
+                        colunas: List[str], conversoes: Dict[str, str]):
+    """Recria a tabela com o novo esquema copiando e convertendo os dados"""
+    nova = f'{tabela}_nova'
+    conn.execute(criar_sql.format(tabela=nova))
+
+    selecao = ', '.join(conversoes.get(coluna, coluna) for coluna in colunas)
+    conn.execute(f'INSERT INTO {nova} ({", ".join(colunas)}) '
+                 f'SELECT {selecao} FROM {tabela}')
+
+    row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (tabela,)).fetchone()
+    conn.execute(f'DROP TABLE {tabela}')
+    conn.execute(f'ALTER TABLE {nova} RENAME TO {tabela}')
+    if row:
+        conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?',
+                     (row[0], tabela))
+
+
+def _datas_para_epoch(conn: sqlite3.Connection):
+    """Converte as datas gravadas como texto para inteiros (epoch).
+
+    Datas de manutenção foram gravadas pelo Python no horário local; as de
+    logs vêm do CURRENT_TIMESTAMP do SQLite, que já está em UTC.
+    """
+    _reconstruir_tabela(conn, 'veiculos', f'''
+        CREATE TABLE {{tabela}} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            placa TEXT UNIQUE NOT NULL,
+            modelo TEXT,
+            ano INTEGER,
+            cor TEXT,
+            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ultima_manutencao INTEGER,
+            ultimo_tipo TEXT,
+            observacoes TEXT
+        )
+    ''', ['id', 'placa', 'modelo', 'ano', 'cor', 'data_cadastro',
+          'ultima_manutencao', 'ultimo_tipo', 'observacoes'],
+        {'ultima_manutencao': _texto_para_epoch('ultima_manutencao', True)})
+
+    _reconstruir_tabela(conn, 'manutencoes', f'''
+        CREATE TABLE {{tabela}} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            placa TEXT NOT NULL,
+            data_manutencao INTEGER DEFAULT {AGORA_EPOCH_SQL},
+            tipo TEXT NOT NULL,
+            observacoes TEXT,
+            tecnico TEXT,
+            FOREIGN KEY (placa) REFERENCES veiculos (placa)
+        )
+    ''', ['id', 'placa', 'data_manutencao', 'tipo', 'observacoes', 'tecnico'],
+        {'data_manutencao': _texto_para_epoch('data_manutencao', True)})
+
+    _reconstruir_tabela(conn, 'logs', f'''
+        CREATE TABLE {{tabela}} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER DEFAULT {AGORA_EPOCH_SQL},
+            usuario TEXT,
+            acao TEXT,
+            detalhes TEXT,
+            ip TEXT
+        )
+    ''', ['id', 'timestamp', 'usuario', 'acao', 'detalhes', 'ip'],
+        {'timestamp': _texto_para_epoch('timestamp', False)})
+
+    for indice in INDICES_V1:
+        conn.execute(indice)
+
+
+def _recalcular_agregado_sql(placa: str) -> str:
+    """Recalcula o agregado de uma placa a partir do histórico"""
+    return f'''
+        DELETE FROM veiculos_agregados WHERE placa = {placa};
+        INSERT INTO veiculos_agregados (placa, total_manutencoes, primeira_manutencao,
+                                        ultima_manutencao, intervalo_medio_dias)
+        SELECT placa, COUNT(*), MIN(data_manutencao), MAX(data_manutencao),
+               CASE WHEN COUNT(*) > 1
+                    THEN (MAX(data_manutencao) - MIN(data_manutencao)) / 86400.0 / (COUNT(*) - 1)
+               END
+        FROM manutencoes WHERE placa = {placa} GROUP BY placa;
+    '''
+
+
+def _criar_agregados_veiculos(conn: sqlite3.Connection):
+    """Cria os agregados por veículo mantidos por triggers em manutencoes"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS veiculos_agregados (
+            placa TEXT PRIMARY KEY,
+            total_manutencoes INTEGER NOT NULL DEFAULT 0,
+            primeira_manutencao INTEGER,
+            ultima_manutencao INTEGER,
+            intervalo_medio_dias REAL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS veiculos_agregados_tipos (
+            placa TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (placa, tipo)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_agregados_total '
+                 'ON veiculos_agregados (total_manutencoes)')
+
+    # Inserção: atualização incremental. Na cláusula DO UPDATE as colunas
+    # ainda têm os valores antigos, então total_manutencoes é o total - 1.
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_manutencoes_agregados_insert
+        AFTER INSERT ON manutencoes
+        BEGIN
+            INSERT INTO veiculos_agregados (placa, total_manutencoes, primeira_manutencao,
+                                            ultima_manutencao, intervalo_medio_dias)
+            VALUES (NEW.placa, 1, NEW.data_manutencao, NEW.data_manutencao, NULL)
+            ON CONFLICT (placa) DO UPDATE SET
+                total_manutencoes = total_manutencoes + 1,
+                primeira_manutencao = MIN(primeira_manutencao, excluded.primeira_manutencao),
+                ultima_manutencao = MAX(ultima_manutencao, excluded.ultima_manutencao),
+                intervalo_medio_dias = (MAX(ultima_manutencao, excluded.ultima_manutencao)
+                                        - MIN(primeira_manutencao, excluded.primeira_manutencao))
+                                       / 86400.0 / total_manutencoes;
+
+            INSERT INTO veiculos_agregados_tipos (placa, tipo, quantidade)
+            VALUES (NEW.placa, NEW.tipo, 1)
+            ON CONFLICT (placa, tipo) DO UPDATE SET quantidade = quantidade + 1;
+        END
+    ''')
+
+    # Remoção e edição são raras: recalcula a placa pelo índice (placa, data)
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_manutencoes_agregados_delete
+        AFTER DELETE ON manutencoes
+        BEGIN
+            {_recalcular_agregado_sql('OLD.placa')}
+            UPDATE veiculos_agregados_tipos SET quantidade = quantidade - 1
+            WHERE placa = OLD.placa AND tipo = OLD.tipo;
+            DELETE FROM veiculos_agregados_tipos
+            WHERE placa = OLD.placa AND tipo = OLD.tipo AND quantidade <= 0;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_manutencoes_agregados_update
+        AFTER UPDATE OF placa, tipo, data_manutencao ON manutencoes
+        BEGIN
+            {_recalcular_agregado_sql('OLD.placa')}
+            {_recalcular_agregado_sql('NEW.placa')}
+            UPDATE veiculos_agregados_tipos SET quantidade = quantidade - 1
+            WHERE placa = OLD.placa AND tipo = OLD.tipo;
+            DELETE FROM veiculos_agregados_tipos
+            WHERE placa = OLD.placa AND tipo = OLD.tipo AND quantidade <= 0;
+            INSERT INTO veiculos_agregados_tipos (placa, tipo, quantidade)
+            VALUES (NEW.placa, NEW.tipo, 1)
+            ON CONFLICT (placa, tipo) DO UPDATE SET quantidade = quantidade + 1;
+        END
+    ''')
+
+    reconstruir_agregados_veiculos(conn)
+
+
+def reconstruir_agregados_veiculos(conn: sqlite3.Connection):
+    """Recalcula todos os agregados por veículo a partir do histórico"""
+    conn.execute('DELETE FROM veiculos_agregados')
+    conn.execute('''
+        INSERT INTO veiculos_agregados (placa, total_manutencoes, primeira_manutencao,
+                                        ultima_manutencao, intervalo_medio_dias)
+        SELECT placa, COUNT(*), MIN(data_manutencao), MAX(data_manutencao),
+               CASE WHEN COUNT(*) > 1
+                    THEN (MAX(data_manutencao) - MIN(data_manutencao)) / 86400.0 / (COUNT(*) - 1)
+               END
+        FROM manutencoes GROUP BY placa
+    ''')
+    conn.execute('DELETE FROM veiculos_agregados_tipos')
+    conn.execute('''
+        INSERT INTO veiculos_agregados_tipos (placa, tipo, quantidade)
+        SELECT placa, tipo, COUNT(*) FROM manutencoes GROUP BY placa, tipo
+    ''')
+
+
+# Dia local da manutenção, usado pelo rollup diário
+DIA_LOCAL_SQL = "date({coluna}, 'unixepoch', 'localtime')"
+
+
+def _criar_manutencoes_diarias(conn: sqlite3.Connection):
+    """Cria o rollup diário (dia, tipo, técnico) mantido por triggers"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS manutencoes_diarias (
+            dia TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            tecnico TEXT NOT NULL DEFAULT '',
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, tipo, tecnico)
+        ) WITHOUT ROWID
+    ''')
+
+    incrementar = '''
+        INSERT INTO manutencoes_diarias (dia, tipo, tecnico, quantidade)
+        VALUES ({dia}, NEW.tipo, IFNULL(NEW.tecnico, ''), 1)
+        ON CONFLICT (dia, tipo, tecnico) DO UPDATE SET quantidade = quantidade + 1;
+    '''.format(dia=DIA_LOCAL_SQL.format(coluna='NEW.data_manutencao'))
+    decrementar = '''
+        UPDATE manutencoes_diarias SET quantidade = quantidade - 1
+        WHERE dia = {dia} AND tipo = OLD.tipo AND tecnico = IFNULL(OLD.tecnico, '');
+        DELETE FROM manutencoes_diarias
+        WHERE dia = {dia} AND tipo = OLD.tipo AND tecnico = IFNULL(OLD.tecnico, '')
+          AND quantidade <= 0;
+    '''.format(dia=DIA_LOCAL_SQL.format(coluna='OLD.data_manutencao'))
+
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_manutencoes_diarias_insert
+        AFTER INSERT ON manutencoes
+        BEGIN {incrementar} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_manutencoes_diarias_delete
+        AFTER DELETE ON manutencoes
+        BEGIN {decrementar} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_manutencoes_diarias_update
+        AFTER UPDATE OF tipo, tecnico, data_manutencao ON manutencoes
+        BEGIN {decrementar} {incrementar} END
+    ''')
+
+    reconstruir_manutencoes_diarias(conn)
+
+
+def reconstruir_manutencoes_diarias(conn: sqlite3.Connection):
+    """Recalcula o rollup diário a partir do histórico completo"""
+    conn.execute('DELETE FROM manutencoes_diarias')
+    conn.execute(f'''
+        INSERT INTO manutencoes_diarias (dia, tipo, tecnico, quantidade)
+        SELECT {DIA_LOCAL_SQL.format(coluna='data_manutencao')} AS dia,
+               tipo, IFNULL(tecnico, '') AS tec, COUNT(*)
+        FROM manutencoes
+        WHERE data_manutencao IS NOT NULL
+        GROUP BY dia, tipo, tec
+    ''')
+
+
+# Índices de busca textual (FTS5, conteúdo externo): tabela indexada ->
+# (tabela de origem, colunas indexadas). O texto não é duplicado; o índice
+# guarda apenas os termos e aponta para o id da linha de origem.
+INDICES_BUSCA = {
+    'manutencoes_fts': ('manutencoes', ('placa', 'tipo', 'observacoes')),
+    'veiculos_fts': ('veiculos', ('placa', 'modelo', 'observacoes'))
+}
+
+
+def fts5_disponivel(conn: sqlite3.Connection) -> bool:
+    """Verifica se o SQLite foi compilado com FTS5"""
+    opcoes = {row[0] for row in conn.execute('PRAGMA compile_options')}
+    return 'ENABLE_FTS5' in opcoes
+
+
+def _criar_busca_fts(conn: sqlite3.Connection):
+    """Cria os índices FTS5 de observações e modelos, mantidos por triggers"""
+    if not fts5_disponivel(conn):
+        print("⚠️ SQLite sem FTS5: busca textual desativada")
+        return
+
+    for indice, (tabela, colunas) in INDICES_BUSCA.items():
+        lista = ', '.join(colunas)
+        novos = ', '.join(f'NEW.{c}' for c in colunas)
+        antigos = ', '.join(f'OLD.{c}' for c in colunas)
+        inserir = f'INSERT INTO {indice} (rowid, {lista}) VALUES (NEW.id, {novos});'
+        remover = (f"INSERT INTO {indice} ({indice}, rowid, {lista}) "
+                   f"VALUES ('delete', OLD.id, {antigos});")
+
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {indice} USING fts5(
+                {lista},
+                content='{tabela}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{indice}_insert
+            AFTER INSERT ON {tabela}
+            BEGIN {inserir} END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{indice}_delete
+            AFTER DELETE ON {tabela}
+            BEGIN {remover} END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{indice}_update
+            AFTER UPDATE OF {lista} ON {tabela}
+            BEGIN {remover} {inserir} END
+        ''')
+
+    reconstruir_busca_fts(conn)
+
+
+def reconstruir_busca_fts(conn: sqlite3.Connection):
+    """Reindexa observações e modelos a partir das tabelas de origem"""
+    if not fts5_disponivel(conn):
+        return
+    existentes = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%_fts'"
+    )}
+    if not set(INDICES_BUSCA) <= existentes:
+        _criar_busca_fts(conn)
+        return
+    for indice in INDICES_BUSCA:
+        conn.execute(f"INSERT INTO {indice} ({indice}) VALUES ('rebuild')")
+
+
+# Contadores de versão dos dados (tabela versoes_dados). ``dashboard`` muda
+# quando as linhas já lidas pelo estado incremental do dashboard deixam de
+# valer: edição ou remoção de veículos e manutenções, ou restauração.
+VERSAO_DASHBOARD = 'dashboard'
+
+
+def _criar_versoes_dados(conn: sqlite3.Connection):
+    """Cria os contadores de versão dos dados, incrementados por triggers"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS versoes_dados (
+            nome TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('INSERT OR IGNORE INTO versoes_dados (nome) VALUES (?)', (VERSAO_DASHBOARD,))
+
+    # Inserções não mudam a versão: o estado as lê pelo maior id já visto.
+    # As colunas de última manutenção do veículo são mantidas pelo registro.
+    incrementar = f"UPDATE versoes_dados SET versao = versao + 1 WHERE nome = '{VERSAO_DASHBOARD}';"
+    gatilhos = {
+        'trg_versao_veiculos_update': 'AFTER UPDATE OF placa, modelo ON veiculos',
+        'trg_versao_veiculos_delete': 'AFTER DELETE ON veiculos',
+        'trg_versao_manutencoes_update':
+            'AFTER UPDATE OF placa, tipo, tecnico, data_manutencao ON manutencoes',
+        'trg_versao_manutencoes_delete': 'AFTER DELETE ON manutencoes'
+    }
+    for nome, evento in gatilhos.items():
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {nome} {evento} BEGIN {incrementar} END')
+
+
+def renovar_versoes_dados(conn: sqlite3.Connection):
+    """Troca as versões por valores aleatórios (ex.: após restaurar um backup).
+
+    O banco restaurado pode ter a mesma versão que o estado já carregado,
+    com outro conteúdo; um valor aleatório evita a coincidência.
+    """
+    conn.execute('UPDATE versoes_dados SET versao = abs(random())')
+
+
+# Migrações do esquema, em ordem. Cada passo é um comando SQL ou uma
+# função que recebe a conexão. Nunca altere uma migração já publicada:
+# adicione uma nova versão no final da lista.
+MIGRACOES = [
+    (1, 'Índices para histórico por placa, datas, tipos e logs', INDICES_V1),
+    (2, 'Datas de manutenção e logs como inteiros (epoch)', [_datas_para_epoch]),
+    (3, 'Índice da última manutenção dos veículos (alertas por faixa)', [
+        'CREATE INDEX IF NOT EXISTS idx_veiculos_ultima_manutencao '
+        'ON veiculos (ultima_manutencao)'
+    ]),
+    (4, 'Índice para paginar veículos pela última manutenção', [
+        'CREATE INDEX IF NOT EXISTS idx_veiculos_ordem_manutencao '
+        'ON veiculos (IFNULL(ultima_manutencao, 0), id)'
+    ]),
+    (5, 'Agregados por veículo mantidos por triggers', [_criar_agregados_veiculos]),
+    (6, 'Rollup diário de manutenções por tipo e técnico', [_criar_manutencoes_diarias]),
+    (7, 'Busca textual (FTS5) em observações e modelos', [_criar_busca_fts]),
+    (8, 'Versões dos dados para o estado incremental do dashboard', [_criar_versoes_dados])
+]
+
+
+def _criar_tabela_versao(conn: sqlite3.Connection):
+    """Cria a tabela que registra as migrações aplicadas"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT,
+            aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def versao_atual(conn: sqlite3.Connection) -> int:
+    """Retorna a versão mais recente aplicada ao banco"""
+    _criar_tabela_versao(conn)
+    row = conn.execute('SELECT MAX(versao) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def aplicar_migracoes(conn: sqlite3.Connection) -> List[int]:
+    """Aplica as migrações pendentes, cada uma em sua própria transação"""
+    aplicadas = []
+    _criar_tabela_versao(conn)
+
+    for versao, descricao, passos in MIGRACOES:
+        if versao <= versao_atual(conn):
+            continue
+
+        # BEGIN IMMEDIATE serializa workers que sobem ao mesmo tempo
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT 1 FROM schema_version WHERE versao = ?', (versao,)
+            ).fetchone()
+            if row:
+                conn.rollback()
+                continue
+
+            for passo in passos:
+                if callable(passo):
+                    passo(conn)
+                else:
+                    conn.execute(passo)
+
+            conn.execute(
+                'INSERT INTO schema_version (versao, descricao) VALUES (?, ?)',
+                (versao, descricao)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        aplicadas.append(versao)
+        print(f"✅ Migração {versao} aplicada: {descricao}")
+
+    return aplicadas
+
+
+def main():
+    """Aplica as migrações pendentes a um arquivo de banco (ex.: backup antigo)"""
+    import argparse
+    from config import Config
+    from database_sqlite import DatabaseSQLite
+
+    parser = argparse.ArgumentParser(description='Migrações do banco de manutenção')
+    parser.add_argument('db_path', nargs='?', default=Config.DATABASE_PATH)
+    parser.add_argument('--status', action='store_true',
+                        help='apenas mostra a versão atual do esquema')
+    parser.add_argument('--reconstruir', action='store_true',
+                        help='recalcula agregados, rollup diário e índice de busca')
+    args = parser.parse_args()
+
+    if args.status:
+        conn = sqlite3.connect(args.db_path)
+        try:
+            print(f"📋 {args.db_path}: versão {versao_atual(conn)} "
+                  f"(última disponível: {MIGRACOES[-1][0]})")
+        finally:
+            conn.close()
+        return
+
+    db = DatabaseSQLite(args.db_path)
+    with db.pool.conexao() as conn:
+        print(f"✅ {args.db_path} na versão {versao_atual(conn)}")
+    
+    if args.reconstruir:
+        with db.pool.transacao() as conn:
+            reconstruir_agregados_veiculos(conn)
+            reconstruir_manutencoes_diarias(conn)
+            reconstruir_busca_fts(conn)
+        print("✅ Agregados, rollup diário e índice de busca reconstruídos")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,57 @@
+import base64
+import json
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class PaginacaoInvalidaError(ValueError):
+    """Cursor ou parâmetro de paginação inválido"""
+
+
+def normalizar_ordem(ordem: str) -> str:
+    """Aceita apenas 'asc' ou 'desc'"""
+    ordem = (ordem or '').lower()
+    if ordem not in ('asc', 'desc'):
+        raise PaginacaoInvalidaError(f'Ordem inválida: {ordem}')
+    return ordem
+
+
+def codificar_cursor(chave: str, valores: Sequence) -> str:
+    """Gera o cursor opaco que aponta para a última linha de uma página"""
+    conteudo = json.dumps({'c': chave, 'v': list(valores)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(conteudo.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: Optional[str], chave: str) -> Optional[List]:
+    """Lê os valores do cursor, validando que é da mesma ordenação"""
+    if not cursor:
+        return None
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        conteudo = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        valores = conteudo['v']
+    except (ValueError, TypeError, KeyError):
+        raise PaginacaoInvalidaError('Cursor inválido')
+    if conteudo.get('c') != chave or not isinstance(valores, list):
+        raise PaginacaoInvalidaError('Cursor não corresponde à ordenação pedida')
+    return valores
+
+
+def clausulas_keyset(expressao: str, ordem: str) -> Tuple[str, str]:
+    """Condição e ORDER BY para paginar por (expressao, id)"""
+    operador = '<' if ordem == 'desc' else '>'
+    direcao = ordem.upper()
+    return (f'({expressao}, id) {operador} (?, ?)',
+            f'ORDER BY {expressao} {direcao}, id {direcao}')
+
+
+def dividir_pagina(linhas: List[Dict], limite: int, chave: str,
+                   valores_cursor: Callable[[Dict], Sequence]) -> Tuple[List[Dict], Optional[str]]:
+    """Separa a página pedida e gera o próximo cursor.
+
+    As consultas buscam ``limite + 1`` linhas: a linha extra só indica que
+    existe uma próxima página.
+    """
+    if len(linhas) <= limite:
+        return linhas, None
+    pagina = linhas[:limite]
+    return pagina, codificar_cursor(chave, valores_cursor(pagina[-1]))
\ No newline at end of file
@@ -0,0 +1,293 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+from urllib.request import pathname2url
+
+from config import Config
+
+
+# PRAGMAs ignorados nas conexões somente leitura
+PRAGMAS_SOMENTE_ESCRITA = ('journal_mode',)
+
+
+class PoolEsgotadoError(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo limite"""
+
+
+class PoolConexoes:
+    """Pool limitado de conexões SQLite reutilizáveis.
+
+    As conexões são emprestadas com ``conexao()`` e devolvidas ao sair do
+    bloco. Chamadas aninhadas na mesma thread reutilizam a conexão já
+    emprestada, de modo que métodos que chamam outros métodos do banco não
+    consomem mais de uma conexão do pool.
+    """
+
+    def __init__(self, db_path: str, tamanho: int = None, timeout: float = None,
+                 verificar_apos: float = None, pragmas: dict = None,
+                 somente_leitura: bool = False):
+        self.db_path = db_path
+        self.somente_leitura = somente_leitura
+        self.pragmas = pragmas if pragmas is not None else Config.SQLITE_PRAGMAS
+        self.tamanho = tamanho or Config.DB_POOL_TAMANHO
+        self.timeout = timeout if timeout is not None else Config.DB_POOL_TIMEOUT_SEGUNDOS
+        self.verificar_apos = (verificar_apos if verificar_apos is not None
+                               else Config.DB_POOL_VERIFICAR_APOS_SEGUNDOS)
+
+        self._livres = LifoQueue()
+        self._criadas = 0
+        self._geracao = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._manutencao_thread = None
+        self._parar_manutencao = threading.Event()
+
+    def _criar_conexao(self) -> sqlite3.Connection:
+        """Abre uma nova conexão física com o perfil de armazenamento"""
+        if self.somente_leitura:
+            uri = f'file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout,
+                                   check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                                   check_same_thread=False)
+        try:
+            for pragma, valor in self.pragmas.items():
+                # O modo de journal só pode ser definido por quem escreve
+                if self.somente_leitura and pragma in PRAGMAS_SOMENTE_ESCRITA:
+                    continue
+                conn.execute(f'PRAGMA {pragma} = {valor}').fetchall()
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _conexao_saudavel(self, conn: sqlite3.Connection, ultimo_uso: float) -> bool:
+        """Testa conexões que ficaram ociosas por muito tempo"""
+        if time.monotonic() - ultimo_uso < self.verificar_apos:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _descartar(self, conn: sqlite3.Connection):
+        """Fecha uma conexão e libera sua vaga no pool"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._criadas -= 1
+
+    def _checkout(self) -> sqlite3.Connection:
+        """Retira uma conexão do pool, criando uma nova se houver vaga"""
+        limite = time.monotonic() + self.timeout
+
+        while True:
+            try:
+                item = self._livres.get_nowait()
+            except Empty:
+                item = None
+
+            if item is None:
+                with self._lock:
+                    pode_criar = self._criadas < self.tamanho
+                    if pode_criar:
+                        self._criadas += 1
+
+                if pode_criar:
+                    try:
+                        return self._criar_conexao()
+                    except Exception:
+                        with self._lock:
+                            self._criadas -= 1
+                        raise
+
+                try:
+                    item = self._livres.get(timeout=max(limite - time.monotonic(), 0))
+                except Empty:
+                    raise PoolEsgotadoError(
+                        f'Nenhuma conexão livre em {self.timeout}s ({self.tamanho} em uso)'
+                    )
+
+            conn, ultimo_uso, geracao = item
+            if geracao == self._geracao and self._conexao_saudavel(conn, ultimo_uso):
+                return conn
+            self._descartar(conn)
+
+    def _checkin(self, conn: sqlite3.Connection, geracao: int):
+        """Devolve a conexão ao pool em estado limpo"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            self._descartar(conn)
+            return
+
+        if geracao != self._geracao:
+            self._descartar(conn)
+            return
+
+        self._livres.put((conn, time.monotonic(), geracao))
+
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão do pool durante o bloco ``with``"""
+        local = self._local
+        if getattr(local, 'conn', None) is not None:
+            yield local.conn
+            return
+
+        geracao = self._geracao
+        conn = self._checkout()
+        local.conn = conn
+        try:
+            yield conn
+        finally:
+            local.conn = None
+            self._checkin(conn, geracao)
+
+    @contextmanager
+    def transacao(self):
+        """Executa o bloco em uma transação de escrita (BEGIN IMMEDIATE).
+
+        Dentro de uma transação já aberta na mesma thread, o bloco passa a
+        fazer parte dela.
+        """
+        with self.conexao() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def snapshot(self):
+        """Executa o bloco em uma transação de leitura.
+
+        Todas as consultas do bloco enxergam o mesmo estado do banco, mesmo
+        que outras conexões gravem nesse meio tempo (WAL). Dentro de um
+        snapshot já aberto na mesma thread, o bloco passa a fazer parte dele.
+        """
+        with self.conexao() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+
+            conn.execute('BEGIN')
+            try:
+                # O snapshot do WAL é fixado na primeira leitura
+                conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+                yield conn
+            finally:
+                conn.rollback()
+
+    def emprestada_nesta_thread(self) -> bool:
+        """Indica se a thread atual está dentro de um bloco deste pool"""
+        return getattr(self._local, 'conn', None) is not None
+
+    def fechar_todas(self):
+        """Fecha as conexões ociosas e invalida as que estão emprestadas.
+
+        Usado antes de substituir o arquivo do banco (restauração de backup).
+        """
+        with self._lock:
+            self._geracao += 1
+
+        while True:
+            try:
+                conn, _, _ = self._livres.get_nowait()
+            except Empty:
+                break
+            self._descartar(conn)
+
+    def checkpoint(self, modo: str = 'PASSIVE') -> tuple:
+        """Transfere o conteúdo do WAL para o arquivo principal"""
+        with self.conexao() as conn:
+            return tuple(conn.execute(f'PRAGMA wal_checkpoint({modo})').fetchone())
+
+    def otimizar(self):
+        """Atualiza as estatísticas usadas pelo planejador de consultas"""
+        with self.conexao() as conn:
+            conn.execute('PRAGMA optimize').fetchall()
+
+    def iniciar_manutencao_automatica(self, intervalo_checkpoint: float = None,
+                                      intervalo_optimize: float = None):
+        """Inicia thread que faz checkpoint do WAL e PRAGMA optimize periodicamente"""
+        if self._manutencao_thread is not None and self._manutencao_thread.is_alive():
+            return
+
+        intervalo_checkpoint = intervalo_checkpoint or Config.SQLITE_CHECKPOINT_INTERVALO_SEGUNDOS
+        intervalo_optimize = intervalo_optimize or Config.SQLITE_OPTIMIZE_INTERVALO_SEGUNDOS
+
+        def executar():
+            proximo_optimize = time.monotonic() + intervalo_optimize
+            while not self._parar_manutencao.wait(intervalo_checkpoint):
+                try:
+                    self.checkpoint()
+                    if time.monotonic() >= proximo_optimize:
+                        self.otimizar()
+                        proximo_optimize = time.monotonic() + intervalo_optimize
+                except Exception as e:
+                    print(f"❌ Erro na manutenção do banco: {e}")
+
+        self._parar_manutencao.clear()
+        self._manutencao_thread = threading.Thread(target=executar, daemon=True)
+        self._manutencao_thread.start()
+
+    def parar_manutencao_automatica(self):
+        """Interrompe a thread de manutenção periódica"""
+        self._parar_manutencao.set()
+
+    def estatisticas(self) -> dict:
+        """Retorna o estado atual do pool"""
+        livres = self._livres.qsize()
+        return {
+            'tamanho': self.tamanho,
+            'abertas': self._criadas,
+            'livres': livres,
+            'em_uso': self._criadas - livres
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obter_pool(db_path: str = None) -> PoolConexoes:
+    """Retorna o pool compartilhado do arquivo de banco informado"""
+    db_path = db_path or Config.DATABASE_PATH
+    chave = os.path.abspath(db_path)
+
+    with _pools_lock:
+        pool = _pools.get(chave)
+        if pool is None:
+            pool = PoolConexoes(db_path)
+            _pools[chave] = pool
+        return pool
+
+
+def obter_pool_leitura(db_path: str = None) -> PoolConexoes:
+    """Retorna o pool somente leitura (mode=ro) usado por dashboard e relatórios"""
+    db_path = db_path or Config.DATABASE_PATH
+    chave = ('leitura', os.path.abspath(db_path))
+
+    with _pools_lock:
+        pool = _pools.get(chave)
+        if pool is None:
+            pool = PoolConexoes(db_path, tamanho=Config.DB_POOL_LEITURA_TAMANHO,
+                                somente_leitura=True)
+            _pools[chave] = pool
+        return pool
\ No newline at end of file
@@ -1,30 +1,45 @@
-import pandas as pd
 from datetime import datetime
 from database_sqlite import DatabaseSQLite
+from pool_conexoes import obter_pool_leitura
+from datas import formatar_epoch
 import os
 
+# Registros mais recentes exportados no relatório de histórico
+HISTORICO_MAX_LINHAS = 10000
+
 class GeradorRelatorios:
     def __init__(self):
         self.db = DatabaseSQLite()
+        # Relatórios leem de conexões somente leitura, em um snapshot consistente
+        self.leitura = obter_pool_leitura(self.db.db_path)
     
     def gerar_relatorio_completo_sqlite(self):
         """Gera relatório completo em Excel com todas as informações"""
+        # pandas só é importado no primeiro relatório: não pesa na inicialização
+        import pandas as pd
+        
         dados = []
         
-        for veiculo in self.db.listar_veiculos():
-            status = self.db.verificar_status(veiculo['placa'])
-            historico = self.db.buscar_historico(veiculo['placa'])
+        with self.leitura.snapshot():
+            veiculos = self.db.listar_veiculos()
+            status_veiculos = self.db.status_para_veiculos(veiculos)
+            agregados = self.db.listar_agregados()
+            stats = self.db.get_estatisticas()
+        
+        for veiculo in veiculos:
+            status = status_veiculos[veiculo['placa']]
+            total = agregados.get(veiculo['placa'], {}).get('total_manutencoes', 0)
             
             dados.append({
                 'Placa': veiculo['placa'],
                 'Modelo': veiculo.get('modelo', 'N/A'),
                 'Ano': veiculo.get('ano', 'N/A'),
                 'Cor': veiculo.get('cor', 'N/A'),
-                'Última Manutenção': veiculo.get('ultima_manutencao', 'Nunca'),
+                'Última Manutenção': formatar_epoch(veiculo.get('ultima_manutencao', 'Nunca')),
                 'Dias sem Manutenção': status.get('dias', 'N/A'),
                 'Status': status.get('cor', 'N/A').upper(),
                 'Último Tipo': veiculo.get('ultimo_tipo', 'N/A'),
-                'Total Manutenções': len(historico),
+                'Total Manutenções': total,
                 'Data Cadastro': veiculo.get('data_cadastro', 'N/A'),
                 'Observações': veiculo.get('observacoes', '')
             })
@@ -57,7 +72,6 @@ class GeradorRelatorios:
                 worksheet.column_dimensions[column_letter].width = adjusted_width
             
             # Adicionar sheet de estatísticas
-            stats = self.db.get_estatisticas()
             df_stats = pd.DataFrame([
                 ['Total de Veículos', stats['total_veiculos']],
                 ['Veículos em Dia', stats['verde']],
@@ -73,24 +87,27 @@ class GeradorRelatorios:
     
     def gerar_relatorio_historico_sqlite(self):
         """Gera relatório de histórico completo de manutenções"""
-        historico = self.db.buscar_historico(limit=10000)
-        
-        if not historico:
+        import pandas as pd
+        
+        with self.leitura.snapshot() as conn:
+            df = pd.read_sql_query('''
+                SELECT id AS "ID", placa AS "Placa", data_manutencao AS "Data",
+                       tipo AS "Tipo", IFNULL(tecnico, 'Sistema') AS "Técnico",
+                       observacoes AS "Observações"
+                FROM manutencoes
+                ORDER BY data_manutencao DESC, id DESC
+                LIMIT ?
+            ''', conn, params=(HISTORICO_MAX_LINHAS + 1,))
+        
+        if df.empty:
             print("❌ Nenhum histórico encontrado!")
             return None
         
-        dados = []
-        for reg in historico:
-            dados.append({
-                'ID': reg['id'],
-                'Placa': reg['placa'],
-                'Data': reg['data_manutencao'],
-                'Tipo': reg['tipo'],
-                'Técnico': reg.get('tecnico', 'Sistema'),
-                'Observações': reg.get('observacoes', '')
-            })
+        if len(df) > HISTORICO_MAX_LINHAS:
+            df = df.iloc[:HISTORICO_MAX_LINHAS]
+            print(f"⚠️ Histórico limitado aos {HISTORICO_MAX_LINHAS} registros mais recentes")
         
-        df = pd.DataFrame(dados)
+        df['Data'] = df['Data'].map(formatar_epoch)
         
         if not os.path.exists('exports'):
             os.makedirs('exports')
@@ -118,7 +135,10 @@ class GeradorRelatorios:
     
     def gerar_relatorio_alertas_sqlite(self):
         """Gera relatório apenas de veículos em alerta"""
-        alertas = self.db.get_alertas()
+        import pandas as pd
+        
+        with self.leitura.snapshot():
+            alertas = self.db.get_alertas()
         dados = []
         
         for alerta in alertas['amarelo']:
@@ -127,7 +147,7 @@ class GeradorRelatorios:
                 'Dias sem Manutenção': alerta['dias'],
                 'Nível': 'ATENÇÃO',
                 'Último Tipo': alerta['ultimo_tipo'],
-                'Última Data': alerta['ultima_manutencao'],
+                'Última Data': formatar_epoch(alerta['ultima_manutencao']),
                 'Prioridade': 'Média'
             })
         
@@ -137,7 +157,7 @@ class GeradorRelatorios:
                 'Dias sem Manutenção': alerta['dias'],
                 'Nível': 'CRÍTICO',
                 'Último Tipo': alerta['ultimo_tipo'],
-                'Última Data': alerta['ultima_manutencao'],
+                'Última Data': formatar_epoch(alerta['ultima_manutencao']),
                 'Prioridade': 'Alta'
             })
         
@@ -156,7 +176,10 @@ class GeradorRelatorios:
     
     def gerar_relatorio_por_tipo_sqlite(self):
         """Gera relatório agrupado por tipo de manutenção"""
-        stats = self.db.get_estatisticas()
+        import pandas as pd
+        
+        with self.leitura.snapshot():
+            stats = self.db.get_estatisticas()
         
         dados = []
         for tipo, quantidade in stats['manutencoes_por_tipo'].items():
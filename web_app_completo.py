@@ -3,8 +3,6 @@ from database_sqlite import DatabaseSQLite
 from auth import AuthManager, login_required, admin_required, criar_admin_padrao
 from api import api_bp, registrar_log
 from backup_manager import BackupManager
-from dashboard import DashboardGenerator
-from relatorios import GeradorRelatorios
 import os
 from datetime import datetime
 import secrets
@@ -19,12 +17,13 @@ app.register_blueprint(api_bp, url_prefix='/api')
 db = DatabaseSQLite()
 auth = AuthManager()
 backup = BackupManager()
-dashboard = DashboardGenerator()
-relatorios = GeradorRelatorios()
 
 # Criar usuário admin padrão
 criar_admin_padrao()
 
+# Checkpoint do WAL e PRAGMA optimize em segundo plano
+db.pool.iniciar_manutencao_automatica()
+
 # ============== ROTAS DA INTERFACE ==============
 @app.route('/')
 def index():